@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+    benchmark.py - measure parsing speed on pages recorded by Pyggs.
+    Copyright (C) 2009-2011 Petr Morávek
+
+    This file is part of Pyggs.
+
+    Pyggs is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation; either version 2 of the License, or
+    (at your option) any later version.
+
+    Pyggs is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along
+    with this program; if not, write to the Free Software Foundation, Inc.,
+    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+from optparse import OptionParser
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(sys.path[0], "libs"))
+
+import gcparser as gcparser
+
+
+# Original cleaner, one regular expression pass per kind of markup
+sequentialPasses = [
+    (re.compile("<p[^>]*>", re.I), "\n** "),
+    (re.compile("<br[^>]*>", re.I), "\n"),
+    (re.compile("<li[^>]*>", re.I), "\n - "),
+    (re.compile("</?h[0-9][^>]*>", re.I), "\n"),
+    (re.compile("<img\s+src=\s*['\"]http://www\.geocaching\.com/images/icons/icon_smile_wink\.gif['\"][^>]*>", re.I), " ;-) "),
+    (re.compile("<img\s+src=\s*['\"]http://www\.geocaching\.com/images/icons/icon_smile_big\.gif['\"][^>]*>", re.I), " :D "),
+    (re.compile("<img\s+src=\s*['\"]http://www\.geocaching\.com/images/icons/icon_smile\.gif['\"][^>]*>", re.I), " :-) "),
+    (re.compile("<img[^>]*alt=['\"]([^'\"]+)['\"][^>]*>", re.I), "[img \\1]"),
+    (re.compile("<img[^>]*>", re.I), "[img]"),
+    (re.compile("<[^>]*>", re.I), "")]
+blankLine = re.compile("^\s+|\s+$|^\s*$\n", re.M)
+doubleSpace = re.compile("\s\s+")
+strayTag = re.compile("<[^>]*(<|$)")
+
+
+def cleanSequential(text):
+    """ Reference for gcparser._clean_HTML, the results should not differ
+        unless the text contains '<' not starting a tag.
+    """
+    text = text.replace("\r", " ").replace("\n", " ")
+    for pattern, replacement in sequentialPasses:
+        text = pattern.sub(replacement, text)
+    text = gcparser._unescape(text)
+    text = blankLine.sub("", text)
+    return doubleSpace.sub(" ", text)
+
+
+def benchmark(pages, sliced, repeat):
+    """ Parse all pages repeat times, return (pages per second, results).
+    """
+    parser = gcparser.CacheDetails()
+    parser.sliced = sliced
+    results = []
+    start = time.time()
+    for i in range(repeat):
+        results = []
+        for page in pages:
+            results.append(dict(parser.parse_page(page.body, page.url)))
+    elapsed = max(time.time() - start, 1e-9)
+    return len(pages) * repeat / elapsed, results
+
+
+def benchmarkCleaner(cleaner, descriptions, repeat):
+    """ Clean all descriptions repeat times, return (MB per second, results).
+    """
+    results = []
+    start = time.time()
+    for i in range(repeat):
+        results = [cleaner(html) for html in descriptions]
+    elapsed = max(time.time() - start, 1e-9)
+    return sum(len(html) for html in descriptions) * repeat / elapsed / 1024**2, results
+
+
+if __name__ == "__main__":
+    optp = OptionParser(usage="%prog [options] ARCHIVE_DIR")
+    optp.add_option("-r", "--repeat", type="int", dest="repeat", default=5, help="how many times to parse every page")
+    optp.add_option("-t", "--trace", action="store_true", dest="trace", default=False, help="parse the pages once more with tracing of regular expressions")
+    opts, args = optp.parse_args()
+    if len(args) != 1:
+        optp.error("archive directory recorded by 'pyggs.py --record' expected")
+
+    archive = gcparser.PageArchive(args[0])
+    pages = [page for page in archive if "cache_details.aspx" in page.url]
+    if not pages:
+        print("No cache details pages in the archive.")
+        sys.exit(1)
+    size = sum(len(page.body) for page in pages)
+    print("{0} cache details pages, {1:.1f} kB on average.".format(len(pages), size / len(pages) / 1024))
+
+    full, expected = benchmark(pages, False, opts.repeat)
+    print("full page search: {0:8.1f} pages/s".format(full))
+    sliced, results = benchmark(pages, True, opts.repeat)
+    print("sliced search:    {0:8.1f} pages/s ({1:+.0%})".format(sliced, sliced / full - 1))
+
+    differ = [page.url for page, a, b in zip(pages, expected, results) if a != b]
+    for url in differ:
+        print("Results differ for '{0}'.".format(url))
+
+    descriptions = [details[field] for details in expected for field in ("shortDescHTML", "longDescHTML") if details.get(field)]
+    sequential, expected = benchmarkCleaner(cleanSequential, descriptions, opts.repeat)
+    print("sequential cleaner:  {0:8.2f} MB/s".format(sequential))
+    cleaner, results = benchmarkCleaner(gcparser._clean_HTML, descriptions, opts.repeat)
+    print("single pass cleaner: {0:8.2f} MB/s ({1:+.0%})".format(cleaner, cleaner / sequential - 1))
+    for html, a, b in zip(descriptions, expected, results):
+        if a != b and strayTag.search(html) is None:
+            differ.append(html)
+            print("Cleaned description differs: {0!r}...".format(html[:60]))
+
+    if opts.trace:
+        gcparser.ParserTracer.enable()
+        benchmark(pages, True, 1)
+        gcparser.ParserTracer.disable()
+        print("")
+        print(gcparser.ParserTracer.summary())
+    sys.exit(1 if differ else 0)
@@ -12,14 +12,35 @@ Classes:
     SeekCacheOCR        --- Improved version of SeekCache, which also parses direction,
                             distance, difficulty, terrain and size of caches in the list.
     SeekResult          --- Sequence wrapper for a result of seek query with lazy loading of next pages.
+    OCRMemo             --- Append-only store of decoded OCR image codes.
+    GlyphIndex          --- Index of glyph bitmasks with tolerant matching.
+    LazyDict            --- Dictionary with some values computed on first access.
+    ConnectionPool      --- Pool of persistent HTTP connections.
+    KeepAliveHandler    --- URL handler re-using connections from ConnectionPool.
+    ContentEncodingProcessor --- URL handler for gzip/deflate compressed transfer.
+    ResponseCache       --- On-disk store of downloaded pages keyed by normalized URL.
+    PageArchive         --- Compressed archive of downloaded pages for record/replay.
+    RateLimiter         --- Base class for request rate limiting policies.
+    TokenBucket         --- Token bucket request rate limiting policy.
+    StatsJournal        --- Append-only journal of download stats.
+    RetryPolicy         --- Retry policy for failed downloads.
+    CircuitBreaker      --- Fail fast when geocaching.com seems to be down.
+    ParserTracer        --- Collect timing and success of the parsing regular expressions.
     Profile             --- Manage user's profile.
-    ImageDownloader     --- Thread for downloading images.
+    ImagePool           --- Bounded pool of threads downloading images.
     Image               --- Basic image manipulation.
     Credentials         --- Named tuple for representing credentails.
     CacheLog            --- Named tuple for representing log from cache listing.
     LogItem             --- Named tuple for representing a log from user's profile'.
+    StoredResponse      --- Named tuple for representing a page from ResponseCache.
+    ArchivedPage        --- Named tuple for representing a page from PageArchive.
+    TraceStats          --- Named tuple for representing stats from ParserTracer.
+    SeekCursor          --- Named tuple for representing position in SeekResult.
     CredentialsError    --- Raised on invalid credentials.
     LoginError          --- Raised when geocaching.com login fails.
+    ReplayError         --- Raised when a page is missing in the archive in replay mode.
+    DownloadError       --- Raised when a download fails and won't be retried.
+    CircuitOpenError    --- Raised when downloads are suspended by CircuitBreaker.
 
 """
 
@@ -29,22 +50,37 @@ __license__ = "GPL"
 
 __version__ = "0.7.3"
 
-from collections import defaultdict, namedtuple, Sequence, Callable
+import codecs
+from collections import defaultdict, namedtuple, Sequence, Callable, MutableMapping
 from datetime import date, datetime, timedelta
+from functools import lru_cache
+from array import array
+import atexit
+from bisect import bisect_right
+import gzip
 from hashlib import md5
 from html.parser import HTMLParser
+import http.client
 from http.cookiejar import CookieJar, LWPCookieJar
+import io
+import json
 import logging
 import os
 import os.path
-from random import randint
+import queue
+from random import randint, random
 import re
+import socket
 import subprocess
+import sys
 import threading
 from time import time, sleep
 import unicodedata
+import urllib.error
 import urllib.parse
 import urllib.request
+import urllib.response
+import zlib
 
 import png
 
@@ -56,14 +92,35 @@ __all__ = ["HTTPInterface",
            "SeekCache",
            "SeekCacheOCR",
            "SeekResult",
+           "OCRMemo",
+           "GlyphIndex",
+           "LazyDict",
+           "ConnectionPool",
+           "KeepAliveHandler",
+           "ContentEncodingProcessor",
+           "ResponseCache",
+           "PageArchive",
+           "RateLimiter",
+           "TokenBucket",
+           "StatsJournal",
+           "RetryPolicy",
+           "CircuitBreaker",
+           "ParserTracer",
            "Profile",
-           "ImageDownloader",
+           "ImagePool",
            "Image",
            "Credentials",
            "CacheLog",
            "LogItem",
+           "StoredResponse",
+           "ArchivedPage",
+           "TraceStats",
+           "SeekCursor",
            "CredentialsError",
-           "LoginError"]
+           "LoginError",
+           "ReplayError",
+           "DownloadError",
+           "CircuitOpenError"]
 
 
 ############################################################
@@ -86,6 +143,30 @@ class LoginError(AssertionError):
     pass
 
 
+class ReplayError(LookupError):
+    """
+    Raised when a page is missing in the archive in replay mode.
+
+    """
+    pass
+
+
+class DownloadError(IOError):
+    """
+    Raised when a download fails and won't be retried.
+
+    """
+    pass
+
+
+class CircuitOpenError(DownloadError):
+    """
+    Raised when downloads are suspended by CircuitBreaker.
+
+    """
+    pass
+
+
 
 ############################################################
 ### Data containers & design patterns                    ###
@@ -97,22 +178,1042 @@ Credentials = namedtuple("Credentials", "username password")
 CacheLog = namedtuple("CacheLog", "luid type date user user_id text")
 """ Named tuple for representing a log from user's profile'. """
 LogItem = namedtuple("LogItem", "luid type date cache")
+""" Named tuple for representing a page from ResponseCache. """
+StoredResponse = namedtuple("StoredResponse", "url body etag modified time")
+""" Named tuple for representing a page from PageArchive. """
+ArchivedPage = namedtuple("ArchivedPage", "url data body time")
+""" Named tuple for representing stats of a regular expression from ParserTracer. """
+TraceStats = namedtuple("TraceStats", "calls hits misses time")
+""" Named tuple for representing the first page not discarded from SeekResult. """
+SeekCursor = namedtuple("SeekCursor", "url post_data offset count")
+
+
+class StaticClass:
+    """
+    Raise TypeError when attempting to create an instance.
+
+    """
+
+    def __new__(cls, *p, **k):
+        raise TypeError("This class cannot be instantionalized.")
+
+
+
+############################################################
+### HTTP interface.                                      ###
+############################################################
+
+class ConnectionPool:
+    """
+    Pool of persistent HTTP connections, idle connections are kept per host.
+
+    Attributes:
+        size            --- Maximum number of idle connections kept per host.
+        idle_timeout    --- Number of seconds after which an idle connection
+                            is discarded.
+
+    Methods:
+        get             --- Get an idle connection to the host, or None.
+        put             --- Return connection to the pool for re-use.
+        clear           --- Close all idle connections.
+
+    """
+
+    def __init__(self, size=4, idle_timeout=60):
+        """
+        Keyworded arguments:
+            size            --- Maximum number of idle connections kept per host.
+            idle_timeout    --- Number of seconds after which an idle connection
+                                is discarded.
+
+        """
+        self._log = logging.getLogger("gcparser.http.pool")
+        self._lock = threading.Lock()
+        self._idle = defaultdict(list)
+        self.size = size
+        self.idle_timeout = idle_timeout
+
+    def get(self, key):
+        """
+        Get an idle connection to the host, or None.
+
+        Arguments:
+            key         --- Tuple (scheme, host).
+
+        """
+        with self._lock:
+            idle = self._idle[key]
+            while len(idle) > 0:
+                connection, released = idle.pop()
+                if released + self.idle_timeout > time():
+                    self._log.debug("Re-using connection to '{0}://{1}'.".format(*key))
+                    return connection
+                connection.close()
+        return None
+
+    def put(self, key, connection):
+        """
+        Return connection to the pool for re-use.
+
+        Arguments:
+            key         --- Tuple (scheme, host).
+            connection  --- HTTPConnection instance.
+
+        """
+        with self._lock:
+            idle = self._idle[key]
+            if len(idle) < self.size:
+                idle.append((connection, time()))
+                return
+        connection.close()
+
+    def clear(self):
+        """
+        Close all idle connections.
+
+        """
+        with self._lock:
+            for idle in self._idle.values():
+                for connection, released in idle:
+                    connection.close()
+            self._idle.clear()
+
+
+class KeepAliveHandler(urllib.request.HTTPHandler, urllib.request.HTTPSHandler):
+    """
+    URL handler re-using persistent connections from ConnectionPool.
+
+    A request failing on a re-used connection is sent again over another one
+    only if its method is idempotent, the server might have already processed
+    e.g. POST before dropping the connection.
+
+    """
+
+    _idempotent_methods = ("GET", "HEAD", "OPTIONS", "TRACE", "PUT", "DELETE")
+
+    def __init__(self, pool):
+        """
+        Arguments:
+            pool        --- ConnectionPool instance.
+
+        """
+        urllib.request.HTTPSHandler.__init__(self)
+        self.pool = pool
+
+    def http_open(self, req):
+        return self._open("http", http.client.HTTPConnection, req)
+
+    def https_open(self, req):
+        return self._open("https", http.client.HTTPSConnection, req, context=getattr(self, "_context", None))
+
+    def _open(self, scheme, connection_class, req, **connection_args):
+        """
+        Send the request over pooled connection and read the whole response,
+        or return streamed response if req.stream is True.
+
+        """
+        host = req.host
+        if not host:
+            raise urllib.error.URLError("no host given")
+        key = (scheme, host)
+        headers = dict(req.unredirected_hdrs)
+        headers.update((name, value) for name, value in req.headers.items() if name not in headers)
+        headers["Connection"] = "keep-alive"
+        headers = dict((name.title(), value) for name, value in headers.items())
+        while True:
+            connection = self.pool.get(key)
+            reused = connection is not None
+            if not reused:
+                connection = connection_class(host, timeout=req.timeout, **connection_args)
+            try:
+                connection.request(req.get_method(), req.selector, req.data, headers)
+                response = connection.getresponse()
+                if not getattr(req, "stream", False):
+                    body = response.read()
+            except (IOError, http.client.HTTPException) as e:
+                connection.close()
+                if reused and req.get_method() in self._idempotent_methods and not isinstance(e, socket.timeout):
+                    # The server has probably dropped the idle connection, try another one.
+                    continue
+                raise urllib.error.URLError(e)
+            break
+        if getattr(req, "stream", False):
+            body = _PooledBody(response, connection, lambda: self.pool.put(key, connection))
+        else:
+            if response.will_close:
+                connection.close()
+            else:
+                self.pool.put(key, connection)
+            body = io.BytesIO(body)
+        result = urllib.response.addinfourl(body, response.msg, req.get_full_url(), response.status)
+        result.msg = response.reason
+        return result
+
+
+class _PooledBody:
+    """ Body of streamed response, the connection is returned to the pool when the body is read completely. """
+
+    def __init__(self, response, connection, release):
+        self._response = response
+        self._connection = connection
+        self._release = release
+
+    def read(self, amt=None):
+        if amt is None or amt < 0:
+            data = self._response.read()
+        else:
+            data = self._response.read(amt)
+        self._check_done(data)
+        return data
+
+    def readline(self, limit=-1):
+        data = self._response.readline(limit)
+        self._check_done(data)
+        return data
+
+    def _check_done(self, data):
+        if self._connection is not None and (not data or self._response.isclosed()):
+            if self._response.will_close:
+                self._connection.close()
+            else:
+                self._release()
+            self._connection = None
+
+    def close(self):
+        if self._connection is not None:
+            # Not read completely, the connection cannot be re-used.
+            self._connection.close()
+            self._connection = None
+        self._response.close()
+
+
+class _DecodingBody:
+    """ Body of streamed response decompressed on the fly. """
+
+    def __init__(self, fp, encoding, chunk_size=8192):
+        self._fp = fp
+        self._encoding = encoding.strip().lower()
+        self._chunk_size = chunk_size
+        self._decompressor = _decompressor(self._encoding)
+        self._started = False
+        self._buffer = b""
+        self._eof = False
+
+    def read(self, amt=None):
+        if amt is None or amt < 0:
+            chunks = [self._buffer]
+            self._buffer = b""
+            while not self._eof:
+                chunks.append(self.read(1048576))
+            return b"".join(chunks)
+        while len(self._buffer) < amt and not self._eof:
+            data = self._decompressor.unconsumed_tail
+            if not data:
+                data = self._fp.read(self._chunk_size)
+            if not data:
+                self._eof = True
+                self._buffer += self._decompressor.flush()
+                break
+            try:
+                self._buffer += self._decompressor.decompress(data, amt - len(self._buffer))
+            except zlib.error:
+                if self._encoding != "deflate" or self._started:
+                    raise
+                # Some servers send raw deflate stream without zlib header.
+                self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+                self._buffer += self._decompressor.decompress(data, amt - len(self._buffer))
+            self._started = True
+        data, self._buffer = self._buffer[:amt], self._buffer[amt:]
+        return data
+
+    def readline(self, limit=-1):
+        while b"\n" not in self._buffer and not self._eof:
+            self._buffer += self.read(self._chunk_size)
+        end = self._buffer.find(b"\n") + 1 or len(self._buffer)
+        if limit is not None and limit >= 0:
+            end = min(end, limit)
+        data, self._buffer = self._buffer[:end], self._buffer[end:]
+        return data
+
+    def close(self):
+        self._fp.close()
+
+
+class ContentEncodingProcessor(urllib.request.BaseHandler):
+    """
+    URL handler asking for gzip/deflate compressed transfer and decompressing
+    the response body.
+
+    """
+
+    # Decompress before HTTPErrorProcessor, so error responses get decoded too.
+    handler_order = 900
+    accept_encoding = "gzip, deflate"
+
+    def http_request(self, req):
+        if not req.has_header("Accept-encoding"):
+            req.add_unredirected_header("Accept-Encoding", self.accept_encoding)
+        return req
+
+    def http_response(self, req, response):
+        headers = response.info()
+        encoding = headers.get("Content-Encoding")
+        if encoding is None or encoding.strip().lower() == "identity":
+            return response
+        del headers["Content-Encoding"]
+        del headers["Content-Length"]
+        if getattr(req, "stream", False):
+            body = _DecodingBody(response, encoding)
+        else:
+            body = _decode_content(response.read(), encoding)
+            headers["Content-Length"] = str(len(body))
+            body = io.BytesIO(body)
+        result = urllib.response.addinfourl(body, headers, response.geturl(), response.getcode())
+        result.msg = response.msg
+        return result
+
+    https_request = http_request
+    https_response = http_response
+
+
+def _decode_content(body, encoding):
+    """
+    Decompress gzip/deflate encoded body.
+
+    Arguments:
+        body        --- Encoded body as bytes.
+        encoding    --- Value of Content-Encoding header.
+
+    """
+    encoding = encoding.strip().lower()
+    if encoding in ("", "identity"):
+        return body
+    decompressor = _decompressor(encoding)
+    try:
+        return decompressor.decompress(body) + decompressor.flush()
+    except zlib.error:
+        if encoding != "deflate":
+            raise
+        # Some servers send raw deflate stream without zlib header.
+        return zlib.decompress(body, -zlib.MAX_WBITS)
+
+
+def _decompressor(encoding):
+    """ Return zlib decompressor object for gzip/deflate encoding. """
+    if encoding in ("gzip", "x-gzip"):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif encoding == "deflate":
+        return zlib.decompressobj()
+    raise urllib.error.URLError("Unsupported content encoding '{0}'.".format(encoding))
+
+
+class ResponseCache:
+    """
+    On-disk store of downloaded pages keyed by normalized URL.
+
+    Every page is stored gzipped in a separate file named by hash of the key,
+    together with its ETag, Last-Modified header and the time of download.
+
+    Methods:
+        key         --- Return the key of the page.
+        get         --- Return StoredResponse for the page, or None.
+        put         --- Store the page.
+        touch       --- Refresh the time of download of the stored page.
+        purge       --- Delete pages downloaded before given age.
+
+    """
+
+    def __init__(self, directory):
+        """
+        Arguments:
+            directory   --- Path to the directory for storing pages.
+
+        """
+        self._log = logging.getLogger("gcparser.http.cache")
+        self._lock = threading.Lock()
+        self.directory = directory
+
+    @staticmethod
+    def key(url, user=None):
+        """
+        Return the key of the page.
+
+        Arguments:
+            url         --- Webpage URL.
+
+        Keyworded arguments:
+            user        --- Username for pages downloaded with authentication.
+
+        """
+        parts = urllib.parse.urlsplit(url)
+        query = urllib.parse.urlencode(sorted(urllib.parse.parse_qsl(parts.query, keep_blank_values=True)))
+        url = urllib.parse.urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", query, ""))
+        if user is not None:
+            url = user + " " + url
+        return md5(url.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Return StoredResponse for the page, or None.
+
+        Arguments:
+            key         --- The key of the page.
+
+        """
+        filename = os.path.join(self.directory, key)
+        if not os.path.isfile(filename):
+            return None
+        try:
+            with gzip.open(filename, "rb") as fp:
+                header = json.loads(fp.readline().decode("utf-8"))
+                body = fp.read().decode("utf-8")
+        except (IOError, ValueError, EOFError):
+            self._log.warn("Stored page '{0}' is corrupted, ignoring.".format(key))
+            return None
+        return StoredResponse(header["url"], body, header["etag"], header["modified"], header["time"])
+
+    def put(self, key, response):
+        """
+        Store the page.
+
+        Arguments:
+            key         --- The key of the page.
+            response    --- StoredResponse instance.
+
+        """
+        header = {"url":response.url, "etag":response.etag, "modified":response.modified, "time":response.time}
+        filename = os.path.join(self.directory, key)
+        with self._lock:
+            self._log.debug("Storing page '{0}'.".format(response.url))
+            with gzip.open(filename, "wb") as fp:
+                fp.write(json.dumps(header).encode("utf-8") + b"\n")
+                fp.write(response.body.encode("utf-8"))
+
+    def touch(self, key, response):
+        """
+        Refresh the time of download of the stored page and return updated StoredResponse.
+
+        Arguments:
+            key         --- The key of the page.
+            response    --- StoredResponse instance.
+
+        """
+        response = response._replace(time=time())
+        self.put(key, response)
+        return response
+
+    def purge(self, max_age):
+        """
+        Delete pages downloaded before given age.
+
+        Arguments:
+            max_age     --- Age in seconds.
+
+        """
+        timeout = time() - max_age
+        with self._lock:
+            for name in os.listdir(self.directory):
+                filename = os.path.join(self.directory, name)
+                if os.path.isfile(filename) and os.path.getmtime(filename) < timeout:
+                    os.remove(filename)
+
+
+class PageArchive:
+    """
+    Compressed archive of downloaded pages for recording and replaying the
+    communication with geocaching.com.
+
+    Every page is stored gzipped in a separate file named by hash of its URL
+    and POST data, together with the time of download.
+
+    Methods:
+        key         --- Return the key of the page.
+        get         --- Return ArchivedPage for the request, or None.
+        put         --- Archive the page.
+        writer      --- Return writer for archiving the page piece by piece.
+        files       --- Return sorted list of filenames of the archived pages.
+        read        --- Return ArchivedPage from the file.
+
+    """
+
+    def __init__(self, directory):
+        """
+        Arguments:
+            directory   --- Path to the archive directory, it is created if needed.
+
+        """
+        self._log = logging.getLogger("gcparser.http.archive")
+        self._lock = threading.Lock()
+        directory = os.path.expanduser(directory)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.directory = directory
+
+    @staticmethod
+    def key(url, data=None):
+        """
+        Return the key of the page.
+
+        Arguments:
+            url         --- Webpage URL.
+
+        Keyworded arguments:
+            data        --- POST data.
+
+        """
+        key = ResponseCache.key(url)
+        if data is not None:
+            key += " " + urllib.parse.urlencode(sorted(data.items()))
+        return md5(key.encode("utf-8")).hexdigest() + ".gz"
+
+    def get(self, url, data=None):
+        """
+        Return ArchivedPage for the request, or None.
+
+        Arguments:
+            url         --- Webpage URL.
+
+        Keyworded arguments:
+            data        --- POST data.
+
+        """
+        return self.read(os.path.join(self.directory, self.key(url, data)))
+
+    def put(self, url, data, body):
+        """
+        Archive the page.
+
+        Arguments:
+            url         --- Webpage URL.
+            data        --- POST data, or None.
+            body        --- Webpage source.
+
+        """
+        writer = self.writer(url, data)
+        writer.write(body)
+        writer.close()
+
+    def __iter__(self):
+        for filename in self.files():
+            page = self.read(filename)
+            if page is not None:
+                yield page
+
+    def __len__(self):
+        return len(self.files())
+
+    def writer(self, url, data):
+        """
+        Return writer for archiving the page piece by piece, the page is
+        archived when the writer is closed.
+
+        Arguments:
+            url         --- Webpage URL.
+            data        --- POST data, or None.
+
+        """
+        return _ArchiveWriter(self, url, data)
+
+    def files(self):
+        """
+        Return sorted list of filenames of the archived pages.
+
+        """
+        return [os.path.join(self.directory, name) for name in sorted(os.listdir(self.directory)) if name.endswith(".gz")]
+
+    def read(self, filename):
+        """
+        Return ArchivedPage from the file, or None if it's missing or corrupted.
+
+        Arguments:
+            filename    --- Filename of the archived page.
+
+        """
+        if not os.path.isfile(filename):
+            return None
+        try:
+            with gzip.open(filename, "rb") as fp:
+                header = json.loads(fp.readline().decode("utf-8"))
+                body = fp.read().decode("utf-8")
+        except (IOError, ValueError, EOFError):
+            self._log.warn("Archived page '{0}' is corrupted, ignoring.".format(filename))
+            return None
+        return ArchivedPage(header["url"], header["data"], body, header["time"])
+
+
+class _ArchiveWriter:
+    """ Write the page to PageArchive piece by piece. """
+
+    def __init__(self, archive, url, data):
+        self._archive = archive
+        self._url = url
+        self._filename = os.path.join(archive.directory, archive.key(url, data))
+        self._tmp_file = "{0}.{1}.part".format(self._filename, threading.current_thread().ident)
+        header = {"url":url, "data":data, "time":time()}
+        self._fp = gzip.open(self._tmp_file, "wb")
+        self._fp.write(json.dumps(header).encode("utf-8") + b"\n")
+
+    def write(self, text):
+        self._fp.write(text.encode("utf-8"))
+
+    def close(self):
+        """ Archive the written page. """
+        self._fp.close()
+        with self._archive._lock:
+            self._archive._log.debug("Archiving page '{0}'.".format(self._url))
+            if os.path.isfile(self._filename):
+                os.remove(self._filename)
+            os.rename(self._tmp_file, self._filename)
+
+    def discard(self):
+        """ Throw away the written data. """
+        self._fp.close()
+        os.remove(self._tmp_file)
+
+
+class RateLimiter:
+    """
+    Base class for request rate limiting policies.
+
+    Time slots are reserved without blocking, so the limiter can be shared
+    by threads and asyncio tasks alike - threads sleep in acquire, coroutines
+    should await asyncio.sleep(limiter.reserve()).
+
+    Methods:
+        reserve     --- Reserve a time slot for the next request and return the
+                        number of seconds to wait for it.
+        acquire     --- Reserve a time slot for the next request and sleep until
+                        it comes.
+        wait_time   --- Return the number of seconds to wait before the next
+                        count requests could be made, without reserving anything.
+        load        --- Load state from a file and keep saving it there.
+        save        --- Save state to the file, if possible.
+
+    Attributes:
+        save_interval   --- Minimum number of seconds between writes of the state
+                            file, changes in between are written by save.
+
+    """
+
+    save_interval = 60
+
+    def __init__(self):
+        self._log = logging.getLogger("gcparser.http.limiter")
+        self._lock = threading.Lock()
+        self._filename = None
+        self._saved = 0
+        self._dirty = False
+
+    def reserve(self):
+        """
+        Reserve a time slot for the next request and return the number of seconds
+        to wait for it.
+
+        """
+        raise NotImplementedError
+
+    def acquire(self):
+        """
+        Reserve a time slot for the next request and sleep until it comes.
+
+        """
+        delay = self.reserve()
+        self._log.debug("Waiting for {0:.1f} seconds.".format(delay))
+        sleep(delay)
+
+    def wait_time(self, count=1):
+        """
+        Return the number of seconds to wait before the next count requests could
+        be made, without reserving anything.
+
+        Keyworded arguments:
+            count       --- Number of requests.
+
+        """
+        raise NotImplementedError
+
+    def load(self, filename):
+        """
+        Load state from a file and keep saving it there.
+
+        Arguments:
+            filename    --- Path to the file, or None to disable saving.
+
+        """
+        with self._lock:
+            self._filename = filename
+            if filename is None or not os.path.isfile(filename):
+                return
+            try:
+                with open(filename, "r", encoding="utf-8") as fp:
+                    self._set_state(json.load(fp))
+            except (IOError, ValueError, KeyError):
+                self._log.warn("Cannot load rate limiter state from '{0}'.".format(filename))
+
+    def save(self):
+        """
+        Save state to the file, if possible.
+
+        """
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def _changed(self):
+        """ Mark state as changed, save it if the last save is old enough. """
+        self._dirty = True
+        if self._saved + self.save_interval <= time():
+            self._save()
+
+    def _save(self):
+        if self._filename is None:
+            return
+        with open(self._filename, "w", encoding="utf-8") as fp:
+            json.dump(self._get_state(), fp)
+        self._saved = time()
+        self._dirty = False
+
+    def _get_state(self):
+        return {}
+
+    def _set_state(self, state):
+        pass
+
+
+class TokenBucket(RateLimiter):
+    """
+    Token bucket request rate limiting policy.
+
+    The bucket holds up to capacity tokens and is refilled by rate tokens per
+    second, every request takes one token. When the bucket is empty, the
+    request has to wait for the next token. Consecutive requests are always
+    at least min_interval seconds apart.
+
+    Attributes:
+        rate            --- Number of tokens added per second.
+        capacity        --- Maximum number of tokens in the bucket (burst size).
+        min_interval    --- Minimum number of seconds between requests.
+
+    """
+
+    def __init__(self, rate, capacity, min_interval=0):
+        """
+        Arguments:
+            rate            --- Number of tokens added per second.
+            capacity        --- Maximum number of tokens in the bucket.
+
+        Keyworded arguments:
+            min_interval    --- Minimum number of seconds between requests.
+
+        """
+        RateLimiter.__init__(self)
+        self.rate = rate
+        self.capacity = capacity
+        self.min_interval = min_interval
+        self._tokens = capacity
+        self._updated = time()
+        self._last = 0
+
+    def _refill(self, now):
+        return min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+
+    def reserve(self):
+        with self._lock:
+            now = time()
+            self._tokens = self._refill(now) - 1
+            self._updated = now
+            start = max(now, self._last + self.min_interval)
+            if self._tokens < 0:
+                # Wait until the debt is paid back.
+                start = max(start, now - self._tokens / self.rate)
+            self._last = start
+            self._changed()
+        return start - now
+
+    def wait_time(self, count=1):
+        with self._lock:
+            now = time()
+            tokens = self._refill(now)
+            start = self._last
+            for i in range(count):
+                tokens -= 1
+                start = max(now, start + self.min_interval)
+                if tokens < 0:
+                    start = max(start, now - tokens / self.rate)
+        return max(0, start - now)
+
+    def _get_state(self):
+        return {"tokens":self._tokens, "updated":self._updated, "last":self._last}
+
+    def _set_state(self, state):
+        self._tokens = min(self.capacity, float(state["tokens"]))
+        self._updated = min(time(), float(state["updated"]))
+        self._last = float(state["last"])
+
+
+class StatsJournal:
+    """
+    Append-only journal of download stats.
+
+    Every download appends a line 'date<TAB>count' to the file, lines for the
+    same date are summed on load. The file is rewritten only when it's
+    compacted, i.e. on load when it contains too many lines, or old entries.
+
+    Methods:
+        load        --- Return dictionary date -> count, compact the file if needed.
+        add         --- Append downloads to the journal.
+        compact     --- Rewrite the file with one line per date.
+
+    """
+
+    def __init__(self, filename, keep_days=93, max_lines=1000):
+        """
+        Arguments:
+            filename    --- Path to the journal file.
+
+        Keyworded arguments:
+            keep_days   --- Number of days to keep the stats for.
+            max_lines   --- Compact the file on load if it has more lines.
+
+        """
+        self._log = logging.getLogger("gcparser.http.stats")
+        self._lock = threading.Lock()
+        self.filename = filename
+        self.keep_days = keep_days
+        self.max_lines = max_lines
+
+    def load(self):
+        """
+        Return dictionary date -> count, compact the file if needed.
+
+        """
+        stats = defaultdict(int)
+        if not os.path.isfile(self.filename):
+            return stats
+        timeout = (date.today() - timedelta(days=self.keep_days)).isoformat()
+        lines = 0
+        expired = False
+        with self._lock:
+            with open(self.filename, "r", encoding="utf-8") as fp:
+                self._log.debug("Loading stats.")
+                for line in fp:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    lines += 1
+                    try:
+                        download_date, download_count = line.split("\t")
+                        download_date = date(*[int(part) for part in download_date.split("-")]).isoformat()
+                        download_count = int(download_count)
+                    except ValueError:
+                        self._log.warn("Ignoring invalid line in stats file '{0}'.".format(self.filename))
+                        continue
+                    if download_date > timeout:
+                        stats[download_date] += download_count
+                    else:
+                        expired = True
+        if expired or lines > self.max_lines:
+            self.compact(stats)
+        return stats
+
+    def add(self, download_date, count=1):
+        """
+        Append downloads to the journal.
+
+        Arguments:
+            download_date   --- Date in ISO format.
+
+        Keyworded arguments:
+            count           --- Number of downloads.
+
+        """
+        with self._lock:
+            with open(self.filename, "a", encoding="utf-8") as fp:
+                fp.write("{0}\t{1}\n".format(download_date, count))
+
+    def compact(self, stats):
+        """
+        Rewrite the file with one line per date.
+
+        Arguments:
+            stats       --- Dictionary date -> count.
+
+        """
+        with self._lock:
+            self._log.debug("Compacting stats.")
+            tmp_file = self.filename + ".tmp"
+            with open(tmp_file, "w", encoding="utf-8") as fp:
+                for download_date, download_count in sorted(stats.items()):
+                    fp.write("{0}\t{1}\n".format(download_date, download_count))
+            if os.path.isfile(self.filename):
+                os.remove(self.filename)
+            os.rename(tmp_file, self.filename)
+
+
+class CircuitBreaker:
+    """
+    Fail fast when geocaching.com seems to be down.
+
+    After threshold consecutive failed attempts the circuit opens and all
+    downloads fail immediately with CircuitOpenError. After reset_timeout
+    seconds one attempt is let through, the circuit closes again on success.
+
+    Methods:
+        check       --- Raise CircuitOpenError if the circuit is open.
+        success     --- Record successful attempt.
+        failure     --- Record failed attempt.
+
+    """
+
+    def __init__(self, threshold=10, reset_timeout=300):
+        """
+        Keyworded arguments:
+            threshold       --- Number of consecutive failures opening the circuit.
+            reset_timeout   --- Number of seconds until the next attempt is allowed.
+
+        """
+        self._log = logging.getLogger("gcparser.http.breaker")
+        self._lock = threading.Lock()
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened = None
+
+    def check(self):
+        """
+        Raise CircuitOpenError if the circuit is open.
+
+        """
+        with self._lock:
+            if self._opened is None:
+                return
+            if self._opened + self.reset_timeout > time():
+                raise CircuitOpenError("Too many failed downloads, not trying again before {0:.0f} seconds.".format(self._opened + self.reset_timeout - time()))
+            # Let one attempt through, re-open immediately on its failure.
+            self._opened = None
+            self._failures = self.threshold - 1
+
+    def success(self):
+        """
+        Record successful attempt.
+
+        """
+        with self._lock:
+            self._failures = 0
+            self._opened = None
+
+    def failure(self):
+        """
+        Record failed attempt.
+
+        """
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.threshold and self._opened is None:
+                self._log.critical("Too many failed downloads, suspending downloads for {0} seconds.".format(self.reset_timeout))
+                self._opened = time()
 
 
-class StaticClass:
+class RetryPolicy:
     """
-    Raise TypeError when attempting to create an instance.
+    Retry policy for failed downloads - exponential backoff with jitter, limited
+    number of attempts and overall deadline per request.
+
+    Attributes:
+        max_attempts    --- Maximum number of attempts per request.
+        deadline        --- Maximum number of seconds spent on one request.
+        backoff         --- Delay before the first retry in seconds.
+        multiplier      --- Multiplier of the delay for every next retry.
+        max_backoff     --- Maximum delay between retries in seconds.
+        jitter          --- Fraction of the delay randomized to spread retries.
+        breaker         --- CircuitBreaker instance, or None.
+
+    Methods:
+        check           --- Raise CircuitOpenError if downloads are suspended.
+        success         --- Record successful attempt.
+        failure         --- Record failed attempt, return the delay before the
+                            next one, or raise DownloadError.
+        is_retryable    --- Check if the error is worth retrying.
 
     """
 
-    def __new__(cls, *p, **k):
-        raise TypeError("This class cannot be instantionalized.")
+    retryable_codes = (408, 429, 500, 502, 503, 504)
 
+    def __init__(self, max_attempts=5, deadline=300, backoff=2, multiplier=3, max_backoff=120, jitter=0.5, breaker=None):
+        """
+        Keyworded arguments:
+            max_attempts    --- Maximum number of attempts per request.
+            deadline        --- Maximum number of seconds spent on one request.
+            backoff         --- Delay before the first retry in seconds.
+            multiplier      --- Multiplier of the delay for every next retry.
+            max_backoff     --- Maximum delay between retries in seconds.
+            jitter          --- Fraction of the delay randomized to spread retries.
+            breaker         --- CircuitBreaker instance, or None.
 
+        """
+        self._log = logging.getLogger("gcparser.http.retry")
+        self.max_attempts = max_attempts
+        self.deadline = deadline
+        self.backoff = backoff
+        self.multiplier = multiplier
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.breaker = breaker
+
+    def check(self):
+        """
+        Raise CircuitOpenError if downloads are suspended.
+
+        """
+        if self.breaker is not None:
+            self.breaker.check()
+
+    def success(self):
+        """
+        Record successful attempt.
+
+        """
+        if self.breaker is not None:
+            self.breaker.success()
+
+    def failure(self, error, url, attempt, start):
+        """
+        Record failed attempt, return the number of seconds to wait before the
+        next one, or raise DownloadError if the request should not be retried.
+
+        Arguments:
+            error       --- The exception.
+            url         --- Downloaded URL.
+            attempt     --- Number of the failed attempt, starting with 1.
+            start       --- Time of the first attempt.
+
+        """
+        if not self.is_retryable(error):
+            raise DownloadError("Cannot download '{0}': {1}".format(url, error))
+        if self.breaker is not None:
+            self.breaker.failure()
+            self.breaker.check()
+        delay = min(self.max_backoff, self.backoff * self.multiplier ** (attempt - 1))
+        delay *= 1 - self.jitter * random()
+        if attempt >= self.max_attempts or time() + delay > start + self.deadline:
+            self._log.error("Giving up downloading '{0}' after {1} attempts.".format(url, attempt))
+            raise DownloadError("Cannot download '{0}': {1}".format(url, error))
+        self._log.error("An error occured while downloading '{0}', will retry in {1:.0f} seconds.".format(url, delay))
+        return delay
+
+    def is_retryable(self, error):
+        """
+        Check if the error is worth retrying - network errors and temporary
+        server errors are, other HTTP errors are not.
+
+        Arguments:
+            error       --- The exception.
+
+        """
+        if isinstance(error, urllib.error.HTTPError):
+            return error.code in self.retryable_codes
+        return isinstance(error, (IOError, socket.timeout, http.client.HTTPException))
 
-############################################################
-### HTTP interface.                                      ###
-############################################################
 
 class HTTPInterface(StaticClass):
     """
@@ -121,33 +1222,61 @@ class HTTPInterface(StaticClass):
 
     Attributes:
         stats            --- Dictionary with download stats of pages with auth=True.
-        request_avg_time --- Desired average request sleep time for pages with
-                             auth=True.
+        rate_limiter     --- RateLimiter for pages with auth=True, its state is
+                             stored in data directory.
+        anonymous_rate_limiter --- RateLimiter for pages with auth=False.
+        pool             --- ConnectionPool shared by all openers, set its size
+                             and idle_timeout to tune connection re-use.
+        response_max_age --- Number of seconds during which a stored page is
+                             used without asking the server, older pages are
+                             revalidated by conditional request.
+        response_keep    --- Number of seconds after which stored pages are
+                             deleted from data directory.
+        retry_policy     --- RetryPolicy for failed downloads.
+        archive          --- PageArchive used for recording/replaying, or None.
+        replay           --- Serve all requests from archive, no network access.
 
     Methods:
         set_credentials --- Set credentials to use for geocaching.com login.
         get_data_dir    --- Get data directory.
         set_data_dir    --- Set data directory for for storing cookies,
                             user_agent, download stats...
+        set_archive     --- Record pages to or replay them from PageArchive.
+        flush           --- Write cookies and rate limiter state to data directory.
         request         --- Retrive/send data from/to geocaching.com website.
+        stream          --- Retrive/send data from/to geocaching.com website,
+                            yield the page piece by piece as it's downloaded.
         build_opener    --- Build URL opener.
         download_url    --- Download data from URL.
         wait            --- Handle wait time to lessen the load on geocaching.com
                             website.
+        expected_wait   --- Return the number of seconds to wait before the next
+                            count requests could be made.
 
     """
 
     _log = logging.getLogger("gcparser.http")
+    _login_url = "https://www.geocaching.com/login/"
     _data_dir = None
     _credentials = Credentials(None, None)
     _cookies = None
+    _cookies_saved = None
+    _stats_journal = None
     _user_agent = None
-    _last_download = 0
-    _first_download = 0
-    _download_count = 0
+    _openers = {}
+    _responses = None
+    _lock = threading.RLock()
 
     stats = defaultdict(int)
-    request_avg_time = 600
+    # Bursts of 20 pages, then one page per 30 seconds in average.
+    rate_limiter = TokenBucket(1/30, 20, min_interval=1)
+    anonymous_rate_limiter = TokenBucket(1, 1)
+    pool = ConnectionPool()
+    response_max_age = 3600
+    response_keep = 7*24*3600
+    retry_policy = RetryPolicy(breaker=CircuitBreaker())
+    archive = None
+    replay = False
 
     @classmethod
     def set_credentials(cls, credentials):
@@ -164,6 +1293,7 @@ class HTTPInterface(StaticClass):
             cls._log.warn("No geocaching.com credentials given, some features won't be accessible.")
         cls._credentials = credentials
         cls._load_stats()
+        cls._load_rate_limiter()
 
     @classmethod
     def get_data_dir(cls, data_dir=None):
@@ -195,9 +1325,34 @@ class HTTPInterface(StaticClass):
                 cls._log.warn("Data directory '{0}' does not exist, caching will be disabled.".format(data_dir))
                 cls._data_dir = None
         cls._load_stats()
+        cls._load_rate_limiter()
+        cls._load_responses()
+
+    @classmethod
+    def set_archive(cls, directory=None, replay=False):
+        """
+        Record all downloaded pages to PageArchive, or replay them from it.
+
+        Keyworded arguments:
+            directory   --- Path to the archive directory, None disables
+                            recording/replaying.
+            replay      --- Serve all requests from the archive, without
+                            touching the network.
+
+        """
+        if directory is None:
+            cls.archive = None
+            cls.replay = False
+            return
+        cls.archive = PageArchive(directory)
+        cls.replay = replay
+        if replay:
+            cls._log.info("Replaying pages from archive '{0}'.".format(cls.archive.directory))
+        else:
+            cls._log.info("Recording pages to archive '{0}'.".format(cls.archive.directory))
 
     @classmethod
-    def request(cls, url, auth=False, data=None, check=True):
+    def request(cls, url, auth=False, data=None, check=True, cache=True):
         """
         Retrive/send data from/to geocaching.com website.
 
@@ -208,49 +1363,171 @@ class HTTPInterface(StaticClass):
             auth        --- Authenticate before request.
             data        --- Data to send with request.
             check       --- Re-check if we're logged in after download.
+            cache       --- Use the stored page, if it's fresh enough, store
+                            the downloaded page (used only if data is None).
 
         """
-        opener = cls.build_opener(auth)
-        cls.wait(auth)
-        webpage = cls.download_url(opener, url, data)
-        if auth:
-            cls._save_cookies()
-            today = date.today().isoformat()
-            cls.stats[today] += 1
-            cls._save_stats()
-        webpage = webpage.read().decode("utf-8")
-        if auth and check and not cls._check_login(webpage):
-            cls._log.debug("We're not actually logged in, refreshing login and redownloading page.")
-            cls._login()
-            return cls.request(url, auth=auth, data=data)
+        if cls.replay:
+            return cls._replay_page(url, data)
+        webpage = cls._download_page(url, auth, data, check, cache)
+        cls._archive_page(url, data, webpage)
         return webpage
 
+    @classmethod
+    def _download_page(cls, url, auth, data, check, cache):
+        """ Return the page from ResponseCache or download it. """
+        key, stored = cls._lookup_response(url, auth, data, cache)
+        if stored is not None and stored.time + cls.response_max_age > time():
+            cls._log.debug("Using stored page '{0}'.".format(url))
+            return stored.body
+        opener = cls.build_opener(auth)
+        relogged = False
+        while True:
+            cls.wait(auth)
+            webpage = cls.download_url(opener, url, data, headers=cls._conditional_headers(stored))
+            if auth:
+                cls._count_download()
+            if stored is not None and webpage.code == 304:
+                cls._log.debug("Page '{0}' not modified, using stored version.".format(url))
+                cls._responses.touch(key, stored)
+                return stored.body
+            info = webpage.info()
+            webpage = webpage.read().decode("utf-8")
+            if auth and check and not cls._check_login(webpage):
+                if relogged:
+                    cls._log.critical("Still not logged in after refreshing login.")
+                    raise LoginError("Cannot log in.")
+                cls._log.debug("We're not actually logged in, refreshing login and redownloading page.")
+                cls._login()
+                relogged = True
+                continue
+            cls._store_response(key, url, webpage, info)
+            return webpage
+
+    @classmethod
+    def stream(cls, url, auth=False, data=None, check=True, chunk_size=65536):
+        """
+        Retrive/send data from/to geocaching.com website, yield the page piece
+        by piece as it's downloaded. The page is never kept whole in memory,
+        so it's not stored in data directory. Login is checked in the first
+        piece only.
+
+        Arguments:
+            url         --- Webpage URL.
+
+        Keyworded arguments:
+            auth        --- Authenticate before request.
+            data        --- Data to send with request.
+            check       --- Re-check if we're logged in after download.
+            chunk_size  --- Number of bytes read at once.
+
+        """
+        if cls.replay:
+            body = cls._replay_page(url, data)
+            for start in range(0, len(body), chunk_size):
+                yield body[start:start+chunk_size]
+            return
+        opener = cls.build_opener(auth)
+        relogged = False
+        while True:
+            cls.wait(auth)
+            webpage = cls.download_url(opener, url, data, stream=True)
+            if auth:
+                cls._count_download()
+            decoder = codecs.getincrementaldecoder("utf-8")()
+            chunk = decoder.decode(webpage.read(chunk_size))
+            if auth and check and not cls._check_login(chunk):
+                webpage.close()
+                if relogged:
+                    cls._log.critical("Still not logged in after refreshing login.")
+                    raise LoginError("Cannot log in.")
+                cls._log.debug("We're not actually logged in, refreshing login and redownloading page.")
+                cls._login()
+                relogged = True
+                continue
+            break
+        writer = None
+        if cls.archive is not None and url != cls._login_url:
+            writer = cls.archive.writer(url, data)
+        try:
+            while True:
+                if chunk:
+                    if writer is not None:
+                        writer.write(chunk)
+                    yield chunk
+                if webpage is None:
+                    break
+                raw = webpage.read(chunk_size)
+                if raw:
+                    chunk = decoder.decode(raw)
+                else:
+                    chunk = decoder.decode(b"", final=True)
+                    webpage.close()
+                    webpage = None
+        except BaseException:
+            if writer is not None:
+                writer.discard()
+            if webpage is not None:
+                webpage.close()
+            raise
+        if writer is not None:
+            writer.close()
+
+    @classmethod
+    def _replay_page(cls, url, data):
+        """ Return the page from archive, raise ReplayError if it's not there. """
+        page = cls.archive.get(url, data)
+        if page is None:
+            raise ReplayError("Page '{0}' is not in the archive.".format(url))
+        cls._log.debug("Replaying page '{0}'.".format(url))
+        return page.body
+
+    @classmethod
+    def _archive_page(cls, url, data, webpage):
+        """ Record the page to archive, if recording. Login pages are never recorded. """
+        if cls.archive is not None and url != cls._login_url:
+            cls.archive.put(url, data, webpage)
+
     @classmethod
     def build_opener(cls, auth=False):
         """
-        Build URL opener.
+        Build URL opener, the opener is built only once and then re-used.
 
         Keyworded arguments:
             auth        --- Authenticate before request.
 
         """
-        if auth:
-            cookies = cls._get_cookies()
-            opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(cookies))
-        else:
-            opener = urllib.request.build_opener()
+        opener = cls._openers.get(auth)
+        if opener is not None:
+            return opener
+        with cls._lock:
+            if auth in cls._openers:
+                return cls._openers[auth]
+            handlers = [KeepAliveHandler(cls.pool), ContentEncodingProcessor()]
+            if auth:
+                cookies = cls._get_cookies()
+                handlers.append(urllib.request.HTTPCookieProcessor(cookies))
+            opener = urllib.request.build_opener(*handlers)
+            opener.addheaders = cls._default_headers()
+            cls._openers[auth] = opener
+        return opener
+
+    @classmethod
+    def _default_headers(cls):
+        """ Return list of headers sent with every request. """
         headers = []
         headers.append(("User-agent", cls._get_user_agent()))
         headers.append(("Accept", "text/xml,application/xml,application/xhtml+xml,text/html;q=0.9,text/plain;q=0.8"))
         headers.append(("Accept-Language", "en-us,en;q=0.5"))
         headers.append(("Accept-Charset", "utf-8,*;q=0.5"))
-        opener.addheaders = headers
-        return opener
+        return headers
 
     @classmethod
-    def download_url(cls, opener, url, data=None, retry=1):
+    def download_url(cls, opener, url, data=None, headers=None, stream=False, policy=None, timeout=None):
         """
-        Download data from URL.
+        Download data from URL, failed downloads are retried according to
+        retry_policy. Raise DownloadError when giving up, or ReplayError in
+        replay mode, which allows no network access.
 
         Arguments:
             opener      --- Opener instance.
@@ -258,20 +1535,41 @@ class HTTPInterface(StaticClass):
 
         Keyworded arguments:
             data        --- POST data.
-            retry       --- Number of seconds to retry in on failed download.
+            headers     --- Additional request headers.
+            stream      --- Don't read the whole response, it's read by caller.
+            policy      --- RetryPolicy to use instead of retry_policy.
+            timeout     --- Socket timeout in seconds.
 
         """
+        if cls.replay:
+            raise ReplayError("Cannot download '{0}' in replay mode.".format(url))
         cls._log.debug("Downloading page '{0}'.".format(url))
-        try:
-            if data is not None:
-                webpage = opener.open(url, urllib.parse.urlencode(data).encode("utf-8"))
-            else:
-                webpage = opener.open(url)
-        except IOError:
-            cls._log.error("An error occured while downloading '{0}', will retry in {1} seconds.".format(url, retry))
-            sleep(retry)
-            return cls.download_url(opener, url, data, retry=min(5*retry, 600))
-        return webpage
+        post_data = None
+        if data is not None:
+            post_data = urllib.parse.urlencode(data).encode("utf-8")
+        if policy is None:
+            policy = cls.retry_policy
+        open_args = {}
+        if timeout is not None:
+            open_args["timeout"] = timeout
+        start = time()
+        attempt = 0
+        while True:
+            attempt += 1
+            policy.check()
+            request = urllib.request.Request(url, post_data, headers or {})
+            request.stream = stream
+            try:
+                webpage = opener.open(request, **open_args)
+            except IOError as e:
+                if isinstance(e, urllib.error.HTTPError) and e.code == 304:
+                    # Not modified, HTTPError works as a response object.
+                    policy.success()
+                    return e
+                sleep(policy.failure(e, url, attempt, start))
+                continue
+            policy.success()
+            return webpage
 
     @classmethod
     def _user_file_name(cls):
@@ -286,40 +1584,53 @@ class HTTPInterface(StaticClass):
         return os.path.join(cls._data_dir, name)
 
     @classmethod
-    def _get_cookies(cls):
-        """ Get cookies - load from file, or create. """
+    def _get_cookies(cls, login=True):
+        """ Get cookies - load from file, or create, log in if needed and login is True. """
         if cls._cookies is not None:
             return cls._cookies
         user_file = cls._user_file_name()
         if user_file is None:
             cls._log.debug("Cannot load cookies - invalid filename.")
             cls._cookies = CookieJar()
-            cls._login()
         else:
             cookie_file = user_file + ".cookies"
             if os.path.isfile(cookie_file):
                 cls._log.debug("Re-using stored cookies.")
                 cls._cookies = LWPCookieJar(cookie_file)
                 cls._cookies.load(ignore_discard=True)
-                logged = False
-                for cookie in cls._cookies:
-                    if cookie.name == "userid":
-                        logged = True
-                        break
-                if not logged:
-                    cls._login()
+                cls._cookies_saved = cls._cookies_fingerprint()
             else:
                 cls._log.debug("No stored cookies, creating new.")
                 cls._cookies = LWPCookieJar(cookie_file)
-                cls._login()
+        if login and not cls._has_login_cookie():
+            cls._login()
         return cls._cookies
 
+    @classmethod
+    def _has_login_cookie(cls):
+        """ Check if there is the login cookie in the cookie jar. """
+        for cookie in cls._cookies:
+            if cookie.name == "userid":
+                return True
+        return False
+
     @classmethod
     def _save_cookies(cls):
         """ Try to save cookies, if possible. """
         if isinstance(cls._cookies, LWPCookieJar):
             cls._log.debug("Saving cookies.")
             cls._cookies.save(ignore_discard=True, ignore_expires=True)
+            cls._cookies_saved = cls._cookies_fingerprint()
+
+    @classmethod
+    def _cookies_fingerprint(cls):
+        """ Return hashable snapshot of the cookie jar. """
+        return frozenset((cookie.domain, cookie.path, cookie.name, cookie.value, cookie.expires) for cookie in cls._cookies)
+
+    @classmethod
+    def _cookies_changed(cls):
+        """ Check if cookies changed since they were last loaded/saved. """
+        return cls._cookies is not None and cls._cookies_fingerprint() != cls._cookies_saved
 
     @classmethod
     def _get_user_agent(cls):
@@ -373,50 +1684,97 @@ class HTTPInterface(StaticClass):
         return "Mozilla/5.0 ({0}; U; {1}; en-US; rv:1.9.0.{2:d}) Gecko/{3} Firefox/3.0.{2:d}".format(system, system_version, version, date)
 
     @classmethod
-    def _load_stats(cls):
-        """ Load download stats from file. """
-        cls.stats = defaultdict(int)
+    def _load_rate_limiter(cls):
+        """ Load state of rate limiter for authenticated pages. """
         user_file = cls._user_file_name()
         if user_file is None:
+            cls.rate_limiter.load(None)
+        else:
+            cls.rate_limiter.load(user_file + ".ratelimit")
+
+    @classmethod
+    def _load_responses(cls):
+        """ Set up ResponseCache in data directory, delete old pages. """
+        cls._responses = None
+        if cls._data_dir is None:
             return
-        stats_file = user_file + ".stats"
-        if os.path.isfile(stats_file):
-            today = date.today()
-            timeout = today - timedelta(days=93)
-            with open(stats_file, "r", encoding="utf-8") as fp:
-                cls._log.debug("Loading stats.")
-                for line in fp.readlines():
-                    line = line.strip()
-                    if not line:
-                        continue
-                    line = line.split("\t")
-                    download_date = line[0].split("-")
-                    download_date = date(int(download_date[0]), int(download_date[1]), int(download_date[2]))
-                    download_count = int(line[1])
-                    if download_date > timeout:
-                        cls.stats[download_date.isoformat()] = download_count
+        responses_dir = os.path.join(cls._data_dir, "responses")
+        if not os.path.isdir(responses_dir):
+            os.mkdir(responses_dir)
+        cls._responses = ResponseCache(responses_dir)
+        cls._responses.purge(cls.response_keep)
+
+    @classmethod
+    def _lookup_response(cls, url, auth, data, cache):
+        """ Return tuple (key, StoredResponse or None), key is None if the page should not be stored. """
+        if not cache or data is not None or cls._responses is None:
+            return None, None
+        if auth:
+            key = ResponseCache.key(url, cls._credentials.username or "")
+        else:
+            key = ResponseCache.key(url)
+        return key, cls._responses.get(key)
 
     @classmethod
-    def _save_stats(cls):
-        """ Try to save stats, if possible. """
+    def _conditional_headers(cls, stored):
+        """ Return headers for conditional request of the stored page. """
+        headers = {}
+        if stored is not None:
+            if stored.etag is not None:
+                headers["If-None-Match"] = stored.etag
+            if stored.modified is not None:
+                headers["If-Modified-Since"] = stored.modified
+        return headers
+
+    @classmethod
+    def _store_response(cls, key, url, body, info):
+        """ Store the downloaded page, if it should be stored. """
+        if key is not None:
+            cls._responses.put(key, StoredResponse(url, body, info.get("ETag"), info.get("Last-Modified"), time()))
+
+    @classmethod
+    def _count_download(cls):
+        """ Update download stats and save cookies, if changed, after authenticated request. """
+        with cls._lock:
+            if cls._cookies_changed():
+                cls._save_cookies()
+            today = date.today().isoformat()
+            cls.stats[today] += 1
+            if cls._stats_journal is not None:
+                cls._stats_journal.add(today)
+
+    @classmethod
+    def flush(cls):
+        """
+        Write cookies and rate limiter state to data directory, if they changed.
+
+        """
+        with cls._lock:
+            if cls._cookies_changed():
+                cls._save_cookies()
+        cls.rate_limiter.save()
+
+    @classmethod
+    def _load_stats(cls):
+        """ Load download stats from journal. """
         user_file = cls._user_file_name()
         if user_file is None:
+            cls._stats_journal = None
+            cls.stats = defaultdict(int)
             return
-        stats_file = user_file + ".stats"
-        with open(stats_file, "w", encoding="utf-8") as fp:
-            cls._log.debug("Saving stats.")
-            for download_date, download_count in cls.stats.items():
-                fp.write("{0}\t{1}\n".format(download_date, download_count))
+        cls._stats_journal = StatsJournal(user_file + ".stats")
+        cls.stats = cls._stats_journal.load()
 
     @classmethod
     def _login(cls):
         """ Log in to geocaching.com, save cookiejar. """
-        if not cls._login_attempt():
-            cls._log.debug("Not logged in, re-trying.")
+        with cls._lock:
             if not cls._login_attempt():
-                cls._log.critical("Login error.")
-                raise LoginError("Cannot log in.")
-        cls._log.debug("Logged in.")
+                cls._log.debug("Not logged in, re-trying.")
+                if not cls._login_attempt():
+                    cls._log.critical("Login error.")
+                    raise LoginError("Cannot log in.")
+            cls._log.debug("Logged in.")
 
     @classmethod
     def _login_attempt(cls):
@@ -424,7 +1782,13 @@ class HTTPInterface(StaticClass):
         cls._log.debug("Attempting to log in.")
         if cls._credentials.username is None or cls._credentials.password is None:
             raise LoginError("Cannot log in - no credentials available.")
-        webpage = cls.request("https://www.geocaching.com/login/", auth=True, check=False)
+        webpage = cls.request(cls._login_url, auth=True, check=False, cache=False)
+        webpage = cls.request(cls._login_url, data=cls._login_data(webpage), auth=True, check=False)
+        return cls._has_login_cookie()
+
+    @classmethod
+    def _login_data(cls, webpage):
+        """ Return POST data for login form. """
         data = {}
         data["ctl00$SiteContent$tbUsername"] = cls._credentials.username
         data["ctl00$SiteContent$tbPassword"] = cls._credentials.password
@@ -432,12 +1796,7 @@ class HTTPInterface(StaticClass):
         data["ctl00$SiteContent$cbRememberMe"] = "on"
         for hidden_input in _pcre("hidden_input").findall(webpage):
             data[hidden_input[0]] = hidden_input[1]
-        webpage = cls.request("https://www.geocaching.com/login/", data=data, auth=True, check=False)
-        for cookie in cls._cookies:
-            cls._log.debug("{0}: {1}".format(cookie.name, cookie.value))
-            if cookie.name == "userid":
-                return True
-        return False
+        return data
 
     @classmethod
     def _check_login(cls, data):
@@ -458,35 +1817,29 @@ class HTTPInterface(StaticClass):
             auth        --- Is this for a page where autentication is needed?
 
         """
-        if not auth:
-            sleep_time = 1
+        if auth:
+            cls.rate_limiter.acquire()
         else:
-            # No request for a long time => reset _first_download value using desired average.
-            cls._first_download = max(time() - cls._download_count * cls.request_avg_time, cls._first_download)
-            # Calculate number of downloaded pages ahead of expected average
-            count = cls._download_count - int((time() - cls._first_download) / cls.request_avg_time)
-            # sleep time 1s: 10/10s => overall 10/10s
-            if count < 10:
-                sleep_time = 1
-            # sleep time 2-8s: 40/3.3m => overall 50/3.5min
-            elif count < 50:
-                sleep_time = randint(2, 8)
-            # sleep time 5-35s: 155/51.6m => overall 205/55.1min
-            elif count < 200:
-                sleep_time = randint(5, 35)
-            # sleep time 10-50s: 315/2.6h => overall 520/3.5h
-            elif count < 500:
-                sleep_time = randint(10, 50)
-            # sleep time 20-80s
-            else:
-                sleep_time = randint(20, 80)
-            cls._download_count += 1
-        cls._log.debug("Waiting for {0} seconds.".format(sleep_time))
-        sleep(max(0, cls._last_download + sleep_time - time()))
-        cls._last_download = time()
+            cls.anonymous_rate_limiter.acquire()
+
+    @classmethod
+    def expected_wait(cls, count=1, auth=True):
+        """
+        Return the number of seconds to wait before the next count requests could
+        be made.
+
+        Keyworded arguments:
+            count       --- Number of requests.
+            auth        --- Is this for pages where autentication is needed?
+
+        """
+        if auth:
+            return cls.rate_limiter.wait_time(count)
+        return cls.anonymous_rate_limiter.wait_time(count)
 
 
 HTTPInterface.set_data_dir("~/.geocaching/parser")
+atexit.register(HTTPInterface.flush)
 
 
 
@@ -511,25 +1864,59 @@ _cache_types["mega"] = "Mega-Event Cache"
 _cache_types["3653"] = "Lost and Found Event Cache"
 
 def _clean_HTML(text):
-    """ Cleans text from HTML markup and unescapes entities. """
+    """
+    Cleans text from HTML markup and unescapes entities.
+
+    Tags with a replacement are replaced in one pass, so the order of the
+    replacements does not matter, then other tags are dropped. '<' not
+    starting a tag is kept as text.
+
+    """
     text = text.replace("\r", " ")
     text = text.replace("\n", " ")
-    text = _pcre("HTMLp").sub("\n** ", text)
-    text = _pcre("HTMLbr").sub("\n", text)
-    text = _pcre("HTMLli").sub("\n - ", text)
-    text = _pcre("HTMLh").sub("\n", text)
-    text = _pcre("HTMLimg_wink").sub(" ;-) ", text)
-    text = _pcre("HTMLimg_smile_big").sub(" :D ", text)
-    text = _pcre("HTMLimg_smile").sub(" :-) ", text)
-    text = _pcre("HTMLimgalt").sub("[img \\1]", text)
-    text = _pcre("HTMLimg").sub("[img]", text)
-    text = _pcre("HTMLtag").sub("", text)
+    cleaned = _pcre("HTMLtag_replaced").sub(_replace_tag, text)
+    cleaned = _pcre("HTMLtag").sub("", cleaned)
     # Escape entities
-    text = _unescape(text)
+    if "&" in cleaned:
+        cleaned = _unescape(cleaned)
     # Remove unnecessary spaces
-    text = _pcre("blank_line").sub("", text)
-    text = _pcre("double_space").sub(" ", text)
-    return text
+    return _pcre("double_space").sub(_replace_space, cleaned).strip()
+
+def _replace_tag(match):
+    """ Return replacement of the tag. """
+    tag = match.group(0)
+    name = tag[1].lower()
+    if name == "p":
+        return "\n** "
+    elif name == "b":
+        return "\n"
+    elif name == "l":
+        return "\n - "
+    elif name in ("h", "/"):
+        return "\n"
+    if "icon_smile" in tag.lower():
+        # alt attribute may contain '>', the rest of the tag is left as text
+        for smiley, replacement in (("HTMLimg_wink", " ;-) "), ("HTMLimg_smile_big", " :D "), ("HTMLimg_smile", " :-) ")):
+            found = _pcre(smiley).match(tag)
+            if found is not None:
+                return replacement + tag[found.end():]
+    if match.group(1) is not None:
+        return "[img {0}]".format(match.group(1))
+    return "[img]"
+
+def _replace_space(match):
+    """ Return replacement of the run of white space. """
+    return _clean_space(match.group(0))
+
+@lru_cache(maxsize=256)
+def _clean_space(space):
+    """ Return cleaned run of white space found between two words. """
+    # Leading and trailing white space is stripped as a whole. Patterns
+    # match white space only and the characters around the run are not
+    # line breaks, so it can be cleaned in isolation.
+    sample = _pcre("blank_line").sub("", "x" + space + "x")
+    sample = _pcre("double_space").sub(" ", sample)
+    return sample[1:-1]
 
 _unescape = HTMLParser().unescape
 
@@ -542,9 +1929,159 @@ def _pcre(name):
         logging.getLogger("gcparser.helpers").error("Uknown PCRE '{0}'.".format(name))
         name = "null"
     if name not in _pcres:
-        _pcres[name] = re.compile(*_pcre_masks[name])
+        pcre = re.compile(*_pcre_masks[name])
+        if ParserTracer.enabled:
+            pcre = _TracedPCRE(name, pcre)
+        _pcres[name] = pcre
     return _pcres[name]
 
+
+class ParserTracer(StaticClass):
+    """
+    Collect match time and success/failure counts of the parsing regular
+    expressions. When disabled, _pcre returns plain compiled expressions, so
+    tracing costs nothing.
+
+    Attributes:
+        enabled     --- Whether the tracing is enabled.
+
+    Methods:
+        enable      --- Start tracing.
+        disable     --- Stop tracing, collected stats are kept.
+        reset       --- Forget collected stats.
+        stats       --- Return dictionary name -> TraceStats.
+        summary     --- Return the stats formatted as a table.
+
+    """
+
+    enabled = False
+    _stats = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def enable(cls):
+        """
+        Start tracing.
+
+        """
+        cls.enabled = True
+        _pcres.clear()
+
+    @classmethod
+    def disable(cls):
+        """
+        Stop tracing, collected stats are kept.
+
+        """
+        cls.enabled = False
+        _pcres.clear()
+
+    @classmethod
+    def reset(cls):
+        """
+        Forget collected stats.
+
+        """
+        with cls._lock:
+            cls._stats.clear()
+
+    @classmethod
+    def record(cls, name, elapsed, hits):
+        """
+        Record one call of the regular expression.
+
+        Arguments:
+            name        --- Name of the regular expression.
+            elapsed     --- Time spent in the call in seconds.
+            hits        --- Number of matches.
+
+        """
+        with cls._lock:
+            stats = cls._stats.get(name)
+            if stats is None:
+                stats = cls._stats[name] = [0, 0, 0, 0.0]
+            stats[0] += 1
+            if hits:
+                stats[1] += 1
+            else:
+                stats[2] += 1
+            stats[3] += elapsed
+
+    @classmethod
+    def stats(cls):
+        """
+        Return dictionary name -> TraceStats of every called regular expression.
+
+        """
+        with cls._lock:
+            return dict((name, TraceStats(*stats)) for name, stats in cls._stats.items())
+
+    @classmethod
+    def summary(cls):
+        """
+        Return the stats formatted as a table, the most time consuming regular
+        expressions first. Expressions which never matched are flagged, they
+        usually point to a changed layout of the site.
+
+        """
+        stats = cls.stats()
+        total = sum(item.time for item in stats.values()) or 1
+        lines = ["{0:<24} {1:>7} {2:>7} {3:>7} {4:>10} {5:>9} {6:>6}".format("regexp", "calls", "hits", "misses", "total ms", "avg us", "share")]
+        for name, item in sorted(stats.items(), key=lambda item: item[1].time, reverse=True):
+            line = "{0:<24} {1:>7d} {2:>7d} {3:>7d} {4:>10.2f} {5:>9.1f} {6:>6.1%}".format(name, item.calls, item.hits, item.misses, item.time*1000, item.time/item.calls*1000000, item.time/total)
+            if item.hits == 0:
+                line += "  never matched"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+class _TracedPCRE:
+    """ Compiled regular expression reporting its calls to ParserTracer. """
+
+    def __init__(self, name, pcre):
+        self._name = name
+        self._pcre = pcre
+
+    def __getattr__(self, attr):
+        return getattr(self._pcre, attr)
+
+    def _call(self, method, args, kwargs, count):
+        start = time()
+        result = getattr(self._pcre, method)(*args, **kwargs)
+        if count is not None:
+            result = count(result)
+        if method == "subn":
+            hits = result[1]
+        elif method == "split":
+            # Unsplit string is returned in a list even without a match
+            hits = len(result) > 1
+        else:
+            hits = result
+        ParserTracer.record(self._name, time() - start, hits)
+        return result
+
+    def search(self, *args, **kwargs):
+        return self._call("search", args, kwargs, None)
+
+    def match(self, *args, **kwargs):
+        return self._call("match", args, kwargs, None)
+
+    def findall(self, *args, **kwargs):
+        return self._call("findall", args, kwargs, None)
+
+    def finditer(self, *args, **kwargs):
+        # Consumed at once, so the matching time is measured.
+        return iter(self._call("finditer", args, kwargs, list))
+
+    def subn(self, *args, **kwargs):
+        return self._call("subn", args, kwargs, None)
+
+    def sub(self, *args, **kwargs):
+        return self.subn(*args, **kwargs)[0]
+
+    def split(self, *args, **kwargs):
+        return self._call("split", args, kwargs, None)
+
 ########################################
 # PCRE: System.                        #
 ########################################
@@ -554,16 +2091,12 @@ _pcre_masks["file_mask"] = ("[^a-zA-Z0-9._-]+", re.A)
 ########################################
 # PCRE: HTML.                        #
 ########################################
-_pcre_masks["HTMLp"] = ("<p[^>]*>", re.I)
-_pcre_masks["HTMLbr"] = ("<br[^>]*>", re.I)
-_pcre_masks["HTMLli"] = ("<li[^>]*>", re.I)
-_pcre_masks["HTMLh"] = ("</?h[0-9][^>]*>", re.I)
+# Tags with a replacement, img with alt attribute first, since the attribute may contain '<' or '>'
+_pcre_masks["HTMLtag_replaced"] = ("<img[^>]*alt=['\"]([^'\"]+)['\"][^>]*>|<(?:p|br|li|/?h[0-9]|img)[^<>]*>", re.I)
+_pcre_masks["HTMLtag"] = ("<[^<>]*>", 0)
 _pcre_masks["HTMLimg_wink"] = ("<img\s+src=\s*['\"]http://www\.geocaching\.com/images/icons/icon_smile_wink\.gif['\"][^>]*>", re.I)
 _pcre_masks["HTMLimg_smile"] = ("<img\s+src=\s*['\"]http://www\.geocaching\.com/images/icons/icon_smile\.gif['\"][^>]*>", re.I)
 _pcre_masks["HTMLimg_smile_big"] = ("<img\s+src=\s*['\"]http://www\.geocaching\.com/images/icons/icon_smile_big\.gif['\"][^>]*>", re.I)
-_pcre_masks["HTMLimgalt"] = ("<img[^>]*alt=['\"]([^'\"]+)['\"][^>]*>", re.I)
-_pcre_masks["HTMLimg"] = ("<img[^>]*>", re.I)
-_pcre_masks["HTMLtag"] = ("<[^>]*>", re.I)
 _pcre_masks["blank_line"] = ("^\s+|\s+$|^\s*$\n", re.M)
 _pcre_masks["double_space"] = ("\s\s+", 0)
 
@@ -576,6 +2109,13 @@ _pcre_masks["double_space"] = ("\s\s+", 0)
 LOG_PARSER = 5
 logging.addLevelName(LOG_PARSER, "PARSER")
 
+def _log_parser(log):
+    """ Return function logging on PARSER level, the message is formatted only if the level is enabled. """
+    def log_parser(message, *args):
+        if log.isEnabledFor(LOG_PARSER):
+            log.log(LOG_PARSER, message.format(*args))
+    return log_parser
+
 ########################################
 # BaseParser.                          #
 ########################################
@@ -596,7 +2136,7 @@ class BaseParser:
 
     def __init__(self):
         if hasattr(self, "_log"):
-            self._log.log_parser = lambda x: self._log.log(LOG_PARSER, x)
+            self._log.log_parser = _log_parser(self._log)
 
 
 ########################################
@@ -680,22 +2220,126 @@ _pcre_masks["cache_log_count"] = ("<img[^>]*alt=\"([^\"]+)\"[^>]*/>([0-9]+)", re
 _pcre_masks["cache_logs"] = ("<table class=\"LogsTable[^\"]*\">(.*?)</table>\s+<p>", re.I|re.S)
 _pcre_masks["cache_log"] = ("<tr><td[^>]*><strong><img.*?title=['\"]([^\"']+)['\"][^>]*/>&nbsp;([a-z]+) ([0-9]+)(, ([0-9]+))? by <a href=['\"](http://www\.geocaching\.com)?/profile/\?guid=([a-z0-9]+-[a-z0-9]+-[a-z0-9]+-[a-z0-9]+-[a-z0-9]+)['\"][^>]*>([^<]+)</a></strong>[^<]*<br\s*/><br\s*/>(.*?)<br\s*/><br\s*/><small><a href=['\"]log.aspx\?LUID=([a-z0-9-]+)['\"] title=['\"]View Log['\"]>View Log</a></small>", re.I|re.S)
 
+# Anchors of the fields in cache details page as tuples (anchor, back), anchor
+# is a lower case literal contained in every match of the field, the match
+# starts with back literal found backwards from anchor (or with anchor itself,
+# if back is None).
+_cache_anchors = {}
+_cache_anchors["PMonly"] = ("has chosen to make this cache listing visible", "<img")
+_cache_anchors["cache_pm"] = ("this is a premium member only cache.", "<p")
+_cache_anchors["cache_details"] = ("was created by", "<meta")
+_cache_anchors["cache_type"] = ("/images/wpttypes/", "<img")
+_cache_anchors["cache_owner_id"] = ("&ds=2", "by <a")
+_cache_anchors["disabled"] = ("cache issues:</strong></p>", "<p")
+_cache_anchors["cache_favorites"] = ("favorite-value", "<span")
+_cache_anchors["cache_coords"] = ("ctl00_contentbody_latlon", "<span")
+_cache_anchors["cache_shortDesc"] = ("ctl00_contentbody_shortdescription", "<div")
+_cache_anchors["cache_longDesc"] = ("ctl00_contentbody_longdescription", "<div")
+_cache_anchors["cache_hint"] = ("div_hint", "<div")
+_cache_anchors["cache_attributes"] = ("attributes", None)
+_cache_anchors["cache_inventory"] = ("ctl00_contentbody_uxtravelbuglist_uxinventorylabel", "<span")
+_cache_anchors["cache_visits"] = ("ctl00_contentbody_lblfindcounts", "<span")
+_cache_anchors["cache_logs"] = ("logstable", "<table")
+# Lower case ASCII letters only, so the offsets are not changed by lower casing.
+_ascii_lower = dict((ord(char), ord(char.lower())) for char in "ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+
+
+class LazyDict(MutableMapping):
+    """
+    Dictionary with some values computed on first access.
+
+    Deferred keys are reported by len, iteration and membership tests without
+    computing their values.
+
+    Methods:
+        defer       --- Set function computing the value of the key on first access.
+        is_loaded   --- Whether the value of the key is already computed.
+
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._data = dict(*args, **kwargs)
+        self._deferred = {}
+
+    def defer(self, key, function):
+        """
+        Set function computing the value of the key on first access.
+
+        Arguments:
+            key         --- Dictionary key.
+            function    --- Callable without arguments returning the value.
+
+        """
+        self._data.pop(key, None)
+        self._deferred[key] = function
+
+    def is_loaded(self, key):
+        """
+        Whether the value of the key is already computed.
+
+        Arguments:
+            key         --- Dictionary key.
+
+        """
+        return key not in self._deferred
+
+    def __getitem__(self, key):
+        if key in self._deferred:
+            self._data[key] = self._deferred.pop(key)()
+        return self._data[key]
+
+    def __setitem__(self, key, value):
+        self._deferred.pop(key, None)
+        self._data[key] = value
+
+    def __delitem__(self, key):
+        if key in self._deferred:
+            del self._deferred[key]
+        else:
+            del self._data[key]
+
+    def __contains__(self, key):
+        return key in self._data or key in self._deferred
+
+    def __iter__(self):
+        keys = list(self._data) + list(self._deferred)
+        for key in keys:
+            yield key
+
+    def __len__(self):
+        return len(self._data) + len(self._deferred)
+
+    def __repr__(self):
+        deferred = ", ".join("{0!r}: ...".format(key) for key in self._deferred)
+        data = repr(self._data)[1:-1]
+        return "{0}({{{1}}})".format(self.__class__.__name__, ", ".join(part for part in (data, deferred) if part))
+
 
 class CacheDetails(BaseParser):
     """
     Parse cache details from webpage source.
 
+    The details are returned as LazyDict, descriptions and logs are parsed only
+    when accessed for the first time.
+
     Attributes:
         logs        --- Whether to return complete list of logs by default.
+        sliced      --- Locate the sections of the page first and search for
+                        every field only from its section on.
 
     Methods:
         get         --- Get cache details as dictionary by guid or waypoint.
+        get_many    --- Get cache details of many caches, yield them as they
+                        are parsed.
+        parse_page  --- Parse cache details from webpage source downloaded
+                        from known URL.
 
     """
 
     _url = "http://www.geocaching.com/seek/cache_details.aspx?decrypt=y"
 
     logs = False
+    sliced = True
 
     def __init__(self, logs=False):
         """
@@ -707,29 +2351,170 @@ class CacheDetails(BaseParser):
         self.logs = logs
         BaseParser.__init__(self)
 
-    def get(self, id_, logs=None):
+    def get(self, id_, logs=None):
+        """
+        Get cache details by guid or waypoint.
+
+        Arguments:
+            id_         --- Geocache waypoint or guid.
+
+        Keyworded arguments:
+            logs        --- Download complete list of logs.
+
+        """
+        url = self._get_url(id_, logs)
+        data = self.http.request(url, auth=True)
+        return self._parse(data, id_, url)
+
+    def get_many(self, ids, logs=None, workers=1, max_failures=5):
+        """
+        Get cache details of many caches by guid or waypoint, yield them as
+        they are parsed (not necessarily in the order of ids). The downloads
+        go through HTTPInterface, so they respect its rate limiter and retry
+        policy. Caches which cannot be downloaded are logged and skipped, but
+        CircuitOpenError or max_failures failed caches in a row stop the
+        workers and the error is raised. Other errors are raised at once.
+
+        Arguments:
+            ids         --- Iterable of geocache waypoints or guids.
+
+        Keyworded arguments:
+            logs        --- Download complete list of logs.
+            workers     --- Number of caches downloaded concurrently.
+            max_failures --- Number of failed caches in a row to give up.
+
+        """
+        ids = list(ids)
+        failures = 0
+        if workers <= 1 or len(ids) <= 1:
+            for id_ in ids:
+                try:
+                    details = self.get(id_, logs)
+                except DownloadError as e:
+                    failures = self._skip_failed(id_, e, failures, max_failures)
+                    continue
+                failures = 0
+                yield details
+            return
+
+        tasks = queue.Queue()
+        for id_ in ids:
+            tasks.put(id_)
+        results = queue.Queue()
+
+        def worker():
+            while True:
+                try:
+                    id_ = tasks.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    results.put((id_, self.get(id_, logs), None))
+                except Exception as e:
+                    results.put((id_, None, e))
+
+        for i in range(min(workers, len(ids))):
+            thread = threading.Thread(target=worker)
+            thread.daemon = True
+            thread.start()
+        try:
+            for i in range(len(ids)):
+                id_, details, error = results.get()
+                if isinstance(error, DownloadError):
+                    failures = self._skip_failed(id_, error, failures, max_failures)
+                    continue
+                if error is not None:
+                    raise error
+                failures = 0
+                yield details
+        finally:
+            # Failed or closed early, stop the workers.
+            while True:
+                try:
+                    tasks.get_nowait()
+                except queue.Empty:
+                    break
+
+    def _skip_failed(self, id_, error, failures, max_failures):
+        """
+        Log cache which cannot be downloaded, return the number of failed caches
+        in a row, or raise the error if downloading should not go on.
+
         """
-        Get cache details by guid or waypoint.
+        failures += 1
+        if isinstance(error, CircuitOpenError) or failures >= max_failures:
+            raise error
+        self._log.error("Skipping cache {0}: {1}".format(id_, error))
+        return failures
 
-        Arguments:
-            id_         --- Geocache waypoint or guid.
+    def parse_page(self, data, url):
+        """
+        Parse cache details from webpage source, e.g. a page from PageArchive.
 
-        Keyworded arguments:
-            logs        --- Download complete list of logs.
+        Arguments:
+            data        --- Webpage source.
+            url         --- URL the page was downloaded from.
 
         """
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(url).query)
+        id_ = query.get("guid", query.get("wp", [""]))[0]
+        return self._parse(data, id_, url)
+
+    def _get_url(self, id_, logs):
+        """ Return URL of cache details page. """
         if logs is None:
             logs = self.logs
-        if _pcre("guid").match(id_) is not None:
-            type_ = "guid"
-        else:
-            type_ = "wp"
-        url = self._url + "&{0}={1}".format(type_, id_)
+        url = self._url + "&{0}={1}".format(self._id_type(id_), id_)
         if logs:
             url = url + "&log=y"
-        data = self.http.request(url, auth=True)
+        return url
+
+    def _id_type(self, id_):
+        """ Return 'guid' or 'wp' according to id_. """
+        if _pcre("guid").match(id_) is not None:
+            return "guid"
+        return "wp"
+
+    def _locate(self, data):
+        """
+        Return dictionary field -> offset of the section of the page, where
+        the field is to be searched for, None if the field is not in the page.
 
-        details = {}
+        """
+        lowered = data.lower()
+        if len(lowered) != len(data):
+            # Some characters changed length, lower case ASCII letters only.
+            lowered = data.translate(_ascii_lower)
+        offsets = {}
+        for name, (anchor, back) in _cache_anchors.items():
+            pos = lowered.find(anchor)
+            if pos == -1:
+                offsets[name] = None
+            elif back is None:
+                offsets[name] = pos
+            else:
+                offsets[name] = max(0, lowered.rfind(back, 0, pos))
+        return offsets
+
+    def _search(self, name, data, offsets):
+        """ Search for the field from the offset of its section. """
+        if offsets is None:
+            return _pcre(name).search(data)
+        pos = offsets.get(name, 0)
+        if pos is None:
+            if ParserTracer.enabled:
+                # Skipped search is still a miss of the field.
+                ParserTracer.record(name, 0.0, 0)
+            return None
+        return _pcre(name).search(data, pos)
+
+    def _parse(self, data, id_, url):
+        """ Parse cache details from webpage source. """
+        offsets = None
+        if self.sliced:
+            offsets = self._locate(data)
+        type_ = self._id_type(id_)
+        details = LazyDict()
         if type_ == "wp":
             details["waypoint"] = id_
         else:
@@ -737,56 +2522,56 @@ class CacheDetails(BaseParser):
             match = _pcre("waypoint").search(data)
             if match is not None:
                 details["waypoint"] = match.group(0)
-                self._log.log_parser("waypoint = {0}".format(details["waypoint"]))
+                self._log.log_parser("waypoint = {0}", details["waypoint"])
             else:
                 self._log.error("Waypoint not found.")
 
-        match = _pcre("PMonly").search(data)
+        match = self._search("PMonly", data, offsets)
         if match is not None:
             details["PMonly"] = True
             self._log.warn("PM only cache at '{0}'.".format(url))
 
             details["name"] = _unescape(match.group(1)).strip()
-            self._log.log_parser("name = {0}".format(details["name"]))
+            self._log.log_parser("name = {0}", details["name"])
 
             match = _pcre("PMowner").search(data)
             if match is not None:
                 details["owner"] = _unescape(match.group(1)).strip()
-                self._log.log_parser("owner = {0}".format(details["owner"]))
+                self._log.log_parser("owner = {0}", details["owner"])
             else:
                 self._log.error("Could not parse cache owner.")
 
             match = _pcre("PMsize").search(data)
             if match is not None:
                 details["size"] = match.group(1).strip()
-                self._log.log_parser("size = {0}".format(details["size"]))
+                self._log.log_parser("size = {0}", details["size"])
             else:
                 self._log.error("Could not parse cache size.")
 
             match = _pcre("PMdifficulty").search(data)
             if match is not None:
                 details["difficulty"] = float(match.group(1))
-                self._log.log_parser("difficulty = {0:.1f}".format(details["difficulty"]))
+                self._log.log_parser("difficulty = {0:.1f}", details["difficulty"])
             else:
                 self._log.error("Could not parse cache difficulty.")
 
             match = _pcre("PMterrain").search(data)
             if match is not None:
                 details["terrain"] = float(match.group(1))
-                self._log.log_parser("terrain = {0:.1f}".format(details["terrain"]))
+                self._log.log_parser("terrain = {0:.1f}", details["terrain"])
             else:
                 self._log.error("Could not parse cache terrain.")
 
             match = _pcre("PMcache_type").search(data)
             if match is not None and match.group(1) in _cache_types:
                 details["type"] = _cache_types[match.group(1)]
-                self._log.log_parser("type = {0}".format(details["type"]))
+                self._log.log_parser("type = {0}", details["type"])
             else:
                 self._log.error("Type not found.")
         else:
-            details["PMonly"] = _pcre("cache_pm").search(data) is not None
+            details["PMonly"] = self._search("cache_pm", data, offsets) is not None
 
-            match = _pcre("cache_details").search(data)
+            match = self._search("cache_details", data, offsets)
             if match is not None:
                 details["name"] = _unescape(_unescape(match.group(1))).strip()
                 details["owner"] = _unescape(_unescape(match.group(2))).strip()
@@ -799,33 +2584,33 @@ class CacheDetails(BaseParser):
                 else:
                     details["province"] = ""
                 details["country"] = _unescape(match.group(15)).strip()
-                self._log.log_parser("name = {0}".format(details["name"]))
-                self._log.log_parser("owner = {0}".format(details["owner"]))
-                self._log.log_parser("hidden = {0}".format(details["hidden"]))
-                self._log.log_parser("size = {0}".format(details["size"]))
-                self._log.log_parser("difficulty = {0:.1f}".format(details["difficulty"]))
-                self._log.log_parser("terrain = {0:.1f}".format(details["terrain"]))
-                self._log.log_parser("country = {0}".format(details["country"]))
-                self._log.log_parser("province = {0}".format(details["province"]))
+                self._log.log_parser("name = {0}", details["name"])
+                self._log.log_parser("owner = {0}", details["owner"])
+                self._log.log_parser("hidden = {0}", details["hidden"])
+                self._log.log_parser("size = {0}", details["size"])
+                self._log.log_parser("difficulty = {0:.1f}", details["difficulty"])
+                self._log.log_parser("terrain = {0:.1f}", details["terrain"])
+                self._log.log_parser("country = {0}", details["country"])
+                self._log.log_parser("province = {0}", details["province"])
             else:
                 self._log.error("Could not parse cache details.")
 
-            match = _pcre("cache_type").search(data)
+            match = self._search("cache_type", data, offsets)
             if match is not None:
                 details["type"] = _unescape(match.group(2)).strip()
                 # GS weird changes bug
                 if details["type"] == "Unknown Cache":
                     details["type"] = "Mystery/Puzzle Cache"
-                self._log.log_parser("type = {0}".format(details["type"]))
+                self._log.log_parser("type = {0}", details["type"])
             else:
                 self._log.error("Type not found.")
 
-            match = _pcre("cache_owner_id").search(data)
+            match = self._search("cache_owner_id", data, offsets)
             if match is not None:
                 details["owner_id"] = match.group(1)
                 details["guid"] = match.group(2)
-                self._log.log_parser("guid = {0}".format(details["guid"]))
-                self._log.log_parser("owner_id = {0}".format(details["owner_id"]))
+                self._log.log_parser("guid = {0}", details["guid"])
+                self._log.log_parser("owner_id = {0}", details["owner_id"])
             else:
                 self._log.error("Owner id not found.")
                 if "guid" not in details:
@@ -833,22 +2618,22 @@ class CacheDetails(BaseParser):
 
             details["disabled"] = 0
             details["archived"] = 0
-            match = _pcre("disabled").search(data)
+            match = self._search("disabled", data, offsets)
             if match is not None:
                 if match.group(1) == "has been archived":
                     details["archived"] = 1
                 details["disabled"] = 1
-                self._log.log_parser("archived = {0}".format(details["archived"]))
-                self._log.log_parser("disabled = {0}".format(details["disabled"]))
+                self._log.log_parser("archived = {0}", details["archived"])
+                self._log.log_parser("disabled = {0}", details["disabled"])
 
-            match = _pcre("cache_favorites").search(data)
+            match = self._search("cache_favorites", data, offsets)
             if match is not None:
                 details["favorites"] = int(match.group(1))
-                self._log.log_parser("favorites = {0}".format(details["favorites"]))
+                self._log.log_parser("favorites = {0}", details["favorites"])
             else:
                 self._log.error("Favorites count not found.")
 
-            match = _pcre("cache_coords").search(data)
+            match = self._search("cache_coords", data, offsets)
             if match is not None:
                 details["lat"] = float(match.group(2)) + float(match.group(3))/60
                 if match.group(1) == "S":
@@ -856,37 +2641,23 @@ class CacheDetails(BaseParser):
                 details["lon"] = float(match.group(5)) + float(match.group(6))/60
                 if match.group(4) == "W":
                     details["lon"] = -details["lon"]
-                self._log.log_parser("lat = {0:.5f}".format(details["lat"]))
-                self._log.log_parser("lon = {0:.5f}".format(details["lon"]))
+                self._log.log_parser("lat = {0:.5f}", details["lat"])
+                self._log.log_parser("lon = {0:.5f}", details["lon"])
             else:
                 self._log.error("Lat, lon not found.")
 
-            match = _pcre("cache_shortDesc").search(data)
-            if match is not None:
-                details["shortDescHTML"] = match.group(1)
-                details["shortDesc"] = _clean_HTML(match.group(1))
-                self._log.log_parser("shortDesc = {0}...".format(details["shortDesc"].replace("\n"," ")[0:50]))
-            else:
-                details["shortDescHTML"] = ""
-                details["shortDesc"] = ""
-
-            match = _pcre("cache_longDesc").search(data)
-            if match is not None:
-                details["longDescHTML"] = match.group(1)
-                details["longDesc"] = _clean_HTML(match.group(1))
-                self._log.log_parser("longDesc = {0}...".format(details["longDesc"].replace("\n"," ")[0:50]))
-            else:
-                details["longDescHTML"] = ""
-                details["longDesc"] = ""
+            self._defer_description(details, "shortDesc", data, offsets)
+            self._defer_description(details, "longDesc", data, offsets)
 
-            match = _pcre("cache_hint").search(data)
+            match = self._search("cache_hint", data, offsets)
             if match is not None:
                 details["hint"] = _unescape(match.group(1).replace("<br>", "\n")).strip()
-                self._log.log_parser("hint = {0}...".format(details["hint"].replace("\n"," ")[0:50]))
+                if self._log.isEnabledFor(LOG_PARSER):
+                    self._log.log_parser("hint = {0}...", details["hint"].replace("\n"," ")[0:50])
             else:
                 details["hint"] = ""
 
-            match = _pcre("cache_attributes").search(data)
+            match = self._search("cache_attributes", data, offsets)
             if match is not None:
                 details["attributes"] = []
                 for item in _pcre("cache_attributes_item").finditer(match.group(1)):
@@ -894,44 +2665,69 @@ class CacheDetails(BaseParser):
                     if attr != "blank":
                         details["attributes"].append(attr)
                 details["attributes"] = ", ".join(details["attributes"])
-                self._log.log_parser("attributes = {0}".format(details["attributes"]))
+                self._log.log_parser("attributes = {0}", details["attributes"])
             else:
                 details["attributes"] = ""
 
             details["inventory"] = {}
-            match = _pcre("cache_inventory").search(data)
+            match = self._search("cache_inventory", data, offsets)
             if match is not None:
                 for part in match.group(1).split("</li>"):
                     match = _pcre("cache_inventory_item").search(part)
                     if match is not None:
                         details["inventory"][match.group(1)] = _unescape(match.group(2)).strip()
-                self._log.log_parser("inventory = {0}".format(details["inventory"]))
+                self._log.log_parser("inventory = {0}", details["inventory"])
 
             details["visits"] = {}
-            match = _pcre("cache_visits").search(data)
+            match = self._search("cache_visits", data, offsets)
             if match is not None:
                 for part in match.group(1).split("&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;"):
                     match = _pcre("cache_log_count").search(part)
                     if match is not None:
                         details["visits"][_unescape(match.group(1)).strip()] = int(match.group(2))
-                self._log.log_parser("visits = {0}".format(details["visits"]))
+                self._log.log_parser("visits = {0}", details["visits"])
 
-            details["logs"] = []
-            match = _pcre("cache_logs").search(data)
-            if match is not None:
-                for part in match.group(1).split("</tr>"):
-                    match = _pcre("cache_log").match(part)
-                    if match is not None:
-                        if match.group(5) is not None:
-                            year = match.group(5)
-                        else:
-                            year = datetime.now().year
-                        log_date = "{0:04d}-{1:02d}-{2:02d}".format(int(year), int(_months_full[match.group(2)]), int(match.group(3)))
-                        details["logs"].append(CacheLog(match.group(10), match.group(1), log_date, match.group(8), match.group(7), match.group(9)))
-                self._log.log_parser("Found {0} logs.".format(len(details["logs"])))
+            details.defer("logs", lambda: self._parse_logs(data, offsets))
 
         return details
 
+    def _defer_description(self, details, field, data, offsets):
+        """ Defer parsing of the description and its HTML source to the first access. """
+        def html():
+            match = self._search("cache_" + field, data, offsets)
+            if match is None:
+                return ""
+            return match.group(1)
+
+        def text():
+            source = details[field + "HTML"]
+            if not source:
+                return ""
+            text = _clean_HTML(source)
+            if self._log.isEnabledFor(LOG_PARSER):
+                self._log.log_parser("{0} = {1}...", field, text.replace("\n"," ")[0:50])
+            return text
+
+        details.defer(field + "HTML", html)
+        details.defer(field, text)
+
+    def _parse_logs(self, data, offsets):
+        """ Parse the list of logs from webpage source. """
+        logs = []
+        match = self._search("cache_logs", data, offsets)
+        if match is not None:
+            for part in match.group(1).split("</tr>"):
+                match = _pcre("cache_log").match(part)
+                if match is not None:
+                    if match.group(5) is not None:
+                        year = match.group(5)
+                    else:
+                        year = datetime.now().year
+                    log_date = "{0:04d}-{1:02d}-{2:02d}".format(int(year), int(_months_full[match.group(2)]), int(match.group(3)))
+                    logs.append(CacheLog(match.group(10), match.group(1), log_date, match.group(8), match.group(7), match.group(9)))
+            self._log.log_parser("Found {0} logs.", len(logs))
+        return logs
+
 
 ########################################
 # MyGeocachingLogs                     #
@@ -972,6 +2768,8 @@ class MyGeocachingLogs(BaseParser):
         get         --- Parse and return list of user's geocaching logs.
         get_finds   --- Parse and return logs of type: Found it,
                         Webcam Photo Taken, Attended
+        iter_logs   --- Parse the logs while downloading the page, yield them
+                        one by one.
 
     """
 
@@ -981,69 +2779,123 @@ class MyGeocachingLogs(BaseParser):
         self._log = logging.getLogger("gcparser.parser.MyGeocachingLogs")
         BaseParser.__init__(self)
 
-    def get(self, log_types=None):
+    def get(self, log_types=None, since=None):
         """
         Parse and return list of user's geocaching logs.
 
         Keyworded arguments:
             log_types       --- If not None return only logs of listed type.
+            since           --- Luid of the newest known log, stop parsing when
+                                it's reached. The log is still returned as the
+                                first one, if it's missing the log was not
+                                found and the list is complete.
 
         """
-        data = self.http.request(self._url, auth=True)
-        expected_count = len(_pcre("logs_visit").findall(data))
-        self._log.debug("Expecting {0} logs...".format(expected_count))
-        logs = []
-        for log in _pcre("logs_item").findall(data):
-            expected_count -= 1
+        logs = list(self.iter_logs(log_types, since))
+        logs.reverse()
+        return logs
 
-            log_type = _unescape(log[0]).strip()
-            self._log.log_parser("type = {0}".format(log_type))
-            if log_types is not None and log_type not in log_types:
-                self._log.debug("Wrong log type, continuing...")
-                continue
-            log_date = "{0:04d}-{1:02d}-{2:02d}".format(int(log[3]), int(log[1]), int(log[2]))
-            log_id = log[20]
-            self._log.log_parser("date = {0}".format(log_date))
-            self._log.log_parser("luid = {0}".format(log_id))
+    def iter_logs(self, log_types=None, since=None):
+        """
+        Parse the logs while downloading the page, yield LogItem instances
+        starting with the newest log. Only the unparsed rest of the downloaded
+        data is kept in memory.
 
-            cache = {}
-            cache["type"] = _unescape(log[7]).strip()
-            # GS weird changes bug
-            if cache["type"] == "Unknown Cache":
-                cache["type"] = "Mystery/Puzzle Cache"
-            cache["disabled"] = 0
-            cache["archived"] = 0
-            if log[11]:
-                cache["disabled"] = 1
-                if log[12]:
-                    cache["archived"] = 1
-            if log[17]:
-                cache["province"] = _unescape(log[17]).strip()
-            else:
-                cache["province"] = ""
-            cache["country"] = _unescape(log[18]).strip()
-            cache["guid"] = log[10]
-            cache["name"] = _unescape(_unescape(log[13])).strip()
-            self._log.log_parser("cache_name = {0}".format(cache["name"]))
-            self._log.log_parser("cache_type = {0}".format(cache["type"]))
-            self._log.log_parser("cache_guid = {0}".format(cache["guid"]))
-            self._log.log_parser("archived = {0}".format(cache["archived"]))
-            self._log.log_parser("disabled = {0}".format(cache["disabled"]))
-            self._log.log_parser("country = {0}".format(cache["country"]))
-            self._log.log_parser("province = {0}".format(cache["province"]))
-
-            logs.append(LogItem(log_id, log_type, log_date, cache))
-        if expected_count > 0:
-            self._log.error("Seems like I missed {0} geocaching logs for some reason.".format(expected_count))
+        Keyworded arguments:
+            log_types       --- If not None yield only logs of listed type.
+            since           --- Luid of the newest known log, stop after it's
+                                yielded.
+
+        """
+        return self._iter_logs(self.http.stream(self._url, auth=True), log_types, since)
+
+    def _parse(self, data, log_types, since=None):
+        """ Parse the list of logs from webpage source. """
+        logs = list(self._iter_logs([data], log_types, since))
         logs.reverse()
         return logs
 
-    def get_finds(self):
+    def _iter_logs(self, chunks, log_types, since=None):
+        """ Parse the logs from pieces of webpage source, rows are split on </tr>. """
+        expected_count = 0
+        rest = ""
+        for chunk in chunks:
+            rest += chunk
+            end = max(rest.rfind("</tr>"), rest.rfind("</TR>"))
+            if end == -1:
+                continue
+            end += len("</tr>")
+            rows, rest = rest[:end], rest[end:]
+            expected_count += len(_pcre("logs_visit").findall(rows))
+            for log in _pcre("logs_item").findall(rows):
+                expected_count -= 1
+                log = self._parse_log(log, log_types)
+                if log is not None:
+                    yield log
+                    if log.luid == since:
+                        self._log.debug("Reached the newest known log, stopping.")
+                        return
+        expected_count += len(_pcre("logs_visit").findall(rest))
+        for log in _pcre("logs_item").findall(rest):
+            expected_count -= 1
+            log = self._parse_log(log, log_types)
+            if log is not None:
+                yield log
+                if log.luid == since:
+                    self._log.debug("Reached the newest known log, stopping.")
+                    return
+        if expected_count > 0:
+            self._log.error("Seems like I missed {0} geocaching logs for some reason.".format(expected_count))
+
+    def _parse_log(self, log, log_types):
+        """ Return LogItem from the match of logs_item, or None if it's of wrong type. """
+        log_type = _unescape(log[0]).strip()
+        self._log.log_parser("type = {0}", log_type)
+        if log_types is not None and log_type not in log_types:
+            self._log.debug("Wrong log type, continuing...")
+            return None
+        log_date = "{0:04d}-{1:02d}-{2:02d}".format(int(log[3]), int(log[1]), int(log[2]))
+        log_id = log[20]
+        self._log.log_parser("date = {0}", log_date)
+        self._log.log_parser("luid = {0}", log_id)
+
+        cache = {}
+        cache["type"] = _unescape(log[7]).strip()
+        # GS weird changes bug
+        if cache["type"] == "Unknown Cache":
+            cache["type"] = "Mystery/Puzzle Cache"
+        cache["disabled"] = 0
+        cache["archived"] = 0
+        if log[11]:
+            cache["disabled"] = 1
+            if log[12]:
+                cache["archived"] = 1
+        if log[17]:
+            cache["province"] = _unescape(log[17]).strip()
+        else:
+            cache["province"] = ""
+        cache["country"] = _unescape(log[18]).strip()
+        cache["guid"] = log[10]
+        cache["name"] = _unescape(_unescape(log[13])).strip()
+        self._log.log_parser("cache_name = {0}", cache["name"])
+        self._log.log_parser("cache_type = {0}", cache["type"])
+        self._log.log_parser("cache_guid = {0}", cache["guid"])
+        self._log.log_parser("archived = {0}", cache["archived"])
+        self._log.log_parser("disabled = {0}", cache["disabled"])
+        self._log.log_parser("country = {0}", cache["country"])
+        self._log.log_parser("province = {0}", cache["province"])
+
+        return LogItem(log_id, log_type, log_date, cache)
+
+    def get_finds(self, since=None):
         """
         Parse and return logs of type: Found it, Webcam Photo Taken, Attended
 
+        Keyworded arguments:
+            since           --- Luid of the newest known find, see get.
+
         """
-        return self.get(("Found it", "Webcam Photo Taken", "Attended"))
+        return self.get(("Found it", "Webcam Photo Taken", "Attended"), since)
 
 
 
@@ -1088,13 +2940,26 @@ class SeekCache(BaseParser):
         user        --- Parse and return sequence of found caches found by user.
         owner       --- Parse and return sequence of found caches placed by user.
         get         --- Parse and return sequence of found caches on url.
+        resume      --- Return sequence of found caches continuing from SeekCursor.
+
+    Attributes:
+        prefetch    --- Number of pages the returned SeekResult downloads in
+                        the background ahead of the one being read.
 
     """
 
     _url = "http://www.geocaching.com/seek/nearest.aspx?"
 
-    def __init__(self):
+    prefetch = 0
+
+    def __init__(self, prefetch=0):
+        """
+        Keyworded arguments:
+            prefetch    --- Number of pages downloaded ahead in the background.
+
+        """
         self._log = logging.getLogger("gcparser.parser.SeekCache")
+        self.prefetch = prefetch
         BaseParser.__init__(self)
 
     def coord(self, lat, lon, dist):
@@ -1145,16 +3010,29 @@ class SeekCache(BaseParser):
 
         """
         count, caches, post_data = self._get_page(url)
-        return SeekResult(caches, count, url, post_data, self)
+        return SeekResult(caches, count, url, post_data, self, prefetch=self.prefetch)
+
+    def resume(self, cursor):
+        """
+        Return sequence of found caches continuing from SeekCursor, caches before
+        the cursor are not available.
+
+        Arguments:
+            cursor      --- SeekCursor from SeekResult.cursor.
+
+        """
+        return SeekResult([], cursor.count, cursor.url, cursor.post_data, self, prefetch=self.prefetch, offset=cursor.offset)
 
     def _get_page(self, url, post_data=None):
-        data = self.http.request(url, data=post_data)
+        # The hidden form data are posted back for the next page, stored page
+        # could carry outdated __VIEWSTATE.
+        data = self.http.request(url, data=post_data, cache=False)
         count, caches, post_data = self._process_page(data)
         return count, caches, post_data
 
-    def _process_page(self, data):
+    def _process_page(self, data, codes=None):
         post_data = self._parse_post_data(data)
-        caches = self._parse_caches(data)
+        caches = self._parse_caches(data, codes)
         count = self._parse_count(data)
         return count, caches, post_data
 
@@ -1174,17 +3052,19 @@ class SeekCache(BaseParser):
             self._log.warn("Could not find total count of found caches... assuming zero.")
             return 0
 
-    def _parse_caches(self, data):
+    def _parse_caches(self, data, codes=None):
+        # codes are decoded images of the page used by SeekCacheOCR, they are
+        # passed along, so one parser can process more pages at once.
         caches = []
         match = _pcre("seek_results").search(data)
         if match is not None:
             for data in _pcre("seek_row").findall(match.group(1)):
                 data = data.split("</td>")
-                cache = self._parse_cache_record(data)
+                cache = self._parse_cache_record(data, codes)
                 caches.append(cache)
         return caches
 
-    def _parse_cache_record(self, data):
+    def _parse_cache_record(self, data, codes=None):
         cache = {}
         match = _pcre("seek_cache").search(data[4])
         if match is not None:
@@ -1209,22 +3089,22 @@ class SeekCache(BaseParser):
             else:
                 cache["province"] = ""
             cache["country"] = _unescape(match.group(17)).strip()
-            self._log.log_parser("name = {0}".format(cache["name"]))
-            self._log.log_parser("waypoint = {0}".format(cache["waypoint"]))
-            self._log.log_parser("guid = {0}".format(cache["guid"]))
-            self._log.log_parser("type = {0}".format(cache["type"]))
-            self._log.log_parser("owner = {0}".format(cache["owner"]))
-            self._log.log_parser("disabled = {0}".format(cache["disabled"]))
-            self._log.log_parser("archived = {0}".format(cache["archived"]))
-            self._log.log_parser("province = {0}".format(cache["province"]))
-            self._log.log_parser("country = {0}".format(cache["country"]))
+            self._log.log_parser("name = {0}", cache["name"])
+            self._log.log_parser("waypoint = {0}", cache["waypoint"])
+            self._log.log_parser("guid = {0}", cache["guid"])
+            self._log.log_parser("type = {0}", cache["type"])
+            self._log.log_parser("owner = {0}", cache["owner"])
+            self._log.log_parser("disabled = {0}", cache["disabled"])
+            self._log.log_parser("archived = {0}", cache["archived"])
+            self._log.log_parser("province = {0}", cache["province"])
+            self._log.log_parser("country = {0}", cache["country"])
         else:
             self._log.critical("Could not parse cache details.")
 
         match = _pcre("seek_date").match(data[7])
         if match is not None:
             cache["hidden"] = "{0:04d}-{1:02d}-{2:02d}".format(int(match.group(4))+2000, _months_abbr[match.group(3)], int(match.group(2)))
-            self._log.log_parser("hidden = {0}".format(cache["hidden"]))
+            self._log.log_parser("hidden = {0}", cache["hidden"])
         else:
             self._log.error("Hidden date not found.")
 
@@ -1244,7 +3124,7 @@ class SeekCache(BaseParser):
                         found_date = found_date - timedelta(days=1)
                     cache["found"] = found_date.isoformat()
         if "found" in cache:
-            self._log.log_parser("found = {0}".format(cache["found"]))
+            self._log.log_parser("found = {0}", cache["found"])
         else:
             cache["found"] = None
             self._log.log_parser("Never found.")
@@ -1259,95 +3139,427 @@ class SeekCache(BaseParser):
         match = _pcre("seek_favorites").search(data[2])
         if match is not None:
             cache["favorites"] = int(match.group(1))
-            self._log.log_parser("favorites = {0:d}".format(cache["favorites"]))
+            self._log.log_parser("favorites = {0:d}", cache["favorites"])
         else:
             cache["favorites"] = 0
             self._log.error("Favorites count not found.")
         return cache
 
 
+class GlyphIndex:
+    """
+    Index of glyph bitmasks with tolerant matching.
+
+    Bitmasks (tuples of row strings, space for empty pixel) are looked up by
+    hash first. When there is no exact match, the bitmask is packed into an
+    integer and compared with the glyphs of the same size by Hamming distance.
+    The nearest glyph is used if it differs in at most tolerance fraction of
+    pixels, and the second nearest differs at least twice as much.
+
+    Methods:
+        from_file   --- Create index from patterns file (classmethod).
+        add         --- Add glyph to the index.
+        match       --- Return value of the glyph matching bitmask, or None.
+        pack        --- Return tuple (width, height, packed bits) of bitmask (staticmethod).
+
+    """
+
+    _bits = str.maketrans({" ": "0", "X": "1"})
+
+    def __init__(self, tolerance=0.1):
+        """
+        Keyworded arguments:
+            tolerance   --- Maximum fraction of different pixels for inexact match.
+
+        """
+        self._log = logging.getLogger("gcparser.parser.glyphs")
+        self.tolerance = tolerance
+        self._exact = {}
+        self._glyphs = {}
+        self._sizes = defaultdict(list)
+
+    @classmethod
+    def from_file(cls, filename, tolerance=0.1):
+        """
+        Create index from patterns file with lines 'value<TAB>row,row,...'.
+
+        Arguments:
+            filename    --- Path to the patterns file.
+
+        Keyworded arguments:
+            tolerance   --- Maximum fraction of different pixels for inexact match.
+
+        """
+        index = cls(tolerance)
+        with open(filename, "r", encoding="utf-8") as fp:
+            for line in fp:
+                line = line.strip("\n").split("\t")
+                if len(line) == 2:
+                    index.add(tuple(line[1].split(",")), line[0])
+        return index
+
+    @staticmethod
+    def pack(bitmask):
+        """
+        Return tuple (width, height, packed bits) of bitmask, or None for empty
+        bitmask.
+
+        Arguments:
+            bitmask     --- Tuple of strings, space for empty pixel.
+
+        """
+        if len(bitmask) == 0 or len(bitmask[0]) == 0:
+            return None
+        bits = "".join(bitmask).translate(GlyphIndex._bits)
+        try:
+            return len(bitmask[0]), len(bitmask), int(bits, 2)
+        except ValueError:
+            # Other characters than space are filled pixels
+            return len(bitmask[0]), len(bitmask), int("".join("0" if char == " " else "1" for char in bits), 2)
+
+    def add(self, bitmask, value):
+        """
+        Add glyph to the index.
+
+        Arguments:
+            bitmask     --- Tuple of strings, space for empty pixel.
+            value       --- Value of the glyph.
+
+        """
+        key = self.pack(bitmask)
+        if key is None:
+            return
+        self._exact[tuple(bitmask)] = value
+        if key not in self._glyphs:
+            self._sizes[key[:2]].append((key[2], value))
+        self._glyphs[key] = value
+
+    def match(self, bitmask):
+        """
+        Return value of the glyph matching bitmask, or None.
+
+        Arguments:
+            bitmask     --- Tuple of strings, space for empty pixel.
+
+        """
+        value = self._exact.get(bitmask)
+        if value is not None:
+            return value
+        key = self.pack(bitmask)
+        if key is None:
+            return None
+        value = self._glyphs.get(key)
+        if value is not None:
+            return value
+        width, height, bits = key
+        best = None
+        best_distance = second_distance = width * height + 1
+        for glyph, glyph_value in self._sizes.get((width, height), ()):
+            distance = bin(bits ^ glyph).count("1")
+            if distance < best_distance:
+                best, best_distance, second_distance = glyph_value, distance, best_distance
+            elif distance < second_distance:
+                second_distance = distance
+        if best is None or best_distance > self.tolerance * width * height or second_distance < 2 * best_distance:
+            return None
+        self._log.debug("Glyph matched as '{0}' with {1} different pixels.".format(best, best_distance))
+        return best
+
+
+class ImagePool:
+    """
+    Bounded pool of threads downloading images.
+
+    The worker threads are started on first use and re-used for all later
+    downloads, connections are re-used by the shared opener of the HTTP
+    interface. At most per_host downloads run concurrently for one host and
+    every download waits for the anonymous rate limiter of the HTTP
+    interface. Failed downloads are retried according to retry_policy of the
+    pool, which is separate from the one for pages, so bad images cannot trip
+    its circuit breaker. Images which cannot be downloaded or decoded are
+    returned empty, as well as all images when replaying, since they are not
+    archived.
+
+    Attributes:
+        retry_policy    --- RetryPolicy for image downloads.
+        timeout         --- Socket timeout in seconds.
+
+    Methods:
+        fetch           --- Download images, return dictionary url -> Image.
+
+    """
+
+    def __init__(self, http=HTTPInterface, workers=4, per_host=2, timeout=20):
+        """
+        Keyworded arguments:
+            http        --- HTTP interface object.
+            workers     --- Number of worker threads.
+            per_host    --- Maximum number of concurrent downloads from one host.
+            timeout     --- Socket timeout in seconds.
+
+        """
+        self._log = logging.getLogger("gcparser.http.images")
+        self._lock = threading.Lock()
+        self._tasks = queue.Queue()
+        self._threads = []
+        self._hosts = {}
+        self.http = http
+        self.workers = workers
+        self.per_host = per_host
+        self.timeout = timeout
+        self.retry_policy = RetryPolicy(max_attempts=2, deadline=30, backoff=1)
+
+    def fetch(self, urls):
+        """
+        Download images, return dictionary url -> Image.
+
+        Arguments:
+            urls        --- Iterable of image URLs.
+
+        """
+        urls = set(urls)
+        if len(urls) == 0:
+            return {}
+        if self.http.replay:
+            return dict((url, Image()) for url in urls)
+        self._start()
+        done = queue.Queue()
+        for url in urls:
+            self._tasks.put((url, done))
+        images = {}
+        for i in range(len(urls)):
+            url, image = done.get()
+            images[url] = image
+        return images
+
+    def _start(self):
+        """ Start missing worker threads. """
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._worker)
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+
+    def _worker(self):
+        while True:
+            url, done = self._tasks.get()
+            done.put((url, self._download(url)))
+
+    def _host_semaphore(self, url):
+        """ Return semaphore limiting concurrent downloads from the host of url. """
+        host = urllib.parse.urlparse(url).netloc
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = threading.BoundedSemaphore(self.per_host)
+            return self._hosts[host]
+
+    def _download(self, url):
+        """ Download and decode image, return empty Image on failure. """
+        try:
+            with self._host_semaphore(url):
+                self.http.wait(False)
+                opener = self.http.build_opener()
+                data = self.http.download_url(opener, url, policy=self.retry_policy, timeout=self.timeout).read()
+            return Image.from_data(data)
+        except Exception as e:
+            self._log.warn("Cannot get image '{0}': {1}".format(url, e))
+            return Image()
+
+
+class OCRMemo:
+    """
+    Append-only store of decoded OCR image codes.
+
+    Every decoded code appends a line 'kind<TAB>code<TAB>values' to the file,
+    values are JSON encoded list. Without filename the codes are remembered
+    only in memory.
+
+    Methods:
+        get         --- Return tuple of decoded values, or None.
+        add         --- Store decoded values of the code.
+
+    """
+
+    def __init__(self, filename=None):
+        """
+        Keyworded arguments:
+            filename    --- Path to the memo file.
+
+        """
+        self._log = logging.getLogger("gcparser.parser.ocr")
+        self._lock = threading.Lock()
+        self.filename = filename
+        self._codes = None
+
+    def _load(self):
+        """ Load codes from the file on first use. """
+        self._codes = {}
+        if self.filename is None or not os.path.isfile(self.filename):
+            return
+        self._log.debug("Loading OCR codes.")
+        with open(self.filename, "r", encoding="utf-8") as fp:
+            for line in fp:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    kind, code, values = line.split("\t")
+                    self._codes[(kind, code)] = tuple(json.loads(values))
+                except ValueError:
+                    self._log.warn("Ignoring invalid line in OCR codes file '{0}'.".format(self.filename))
+
+    def get(self, kind, code):
+        """
+        Return tuple of decoded values, or None.
+
+        Arguments:
+            kind        --- Kind of the image, e.g. 'dd' or 'dts'.
+            code        --- Code of the image from its URL.
+
+        """
+        with self._lock:
+            if self._codes is None:
+                self._load()
+            return self._codes.get((kind, code))
+
+    def add(self, kind, code, values):
+        """
+        Store decoded values of the code.
+
+        Arguments:
+            kind        --- Kind of the image, e.g. 'dd' or 'dts'.
+            code        --- Code of the image from its URL.
+            values      --- Tuple of decoded values.
+
+        """
+        with self._lock:
+            if self._codes is None:
+                self._load()
+            if self._codes.get((kind, code)) == tuple(values):
+                return
+            self._codes[(kind, code)] = tuple(values)
+            if self.filename is None:
+                return
+            try:
+                with open(self.filename, "a", encoding="utf-8") as fp:
+                    fp.write("{0}\t{1}\t{2}\n".format(kind, code, json.dumps(list(values))))
+            except IOError as e:
+                self._log.error("Cannot store OCR code: {0}".format(e))
+
+
 class SeekCacheOCR(SeekCache):
     """
     Improved version of SeekCache, which also parses direction, distance,
     difficulty, terrain and size of caches in the list.
 
+    Decoded images are remembered in OCRMemo in the data directory of the HTTP
+    interface, so known codes are never downloaded again.
+
+    Attributes:
+        images      --- ImagePool shared by all instances.
+        patterns    --- GlyphIndex of known glyphs shared by all instances.
+
     """
 
+    images = ImagePool()
+    patterns = None
+    _patterns_lock = threading.Lock()
+
     def __init__(self):
         self._log = logging.getLogger("gcparser.parser.SeekCacheOCR")
         self._load_patterns()
         BaseParser.__init__(self)
 
-    def _load_patterns(self):
-        self.patterns = {}
-        with open(os.path.join(os.path.dirname(__file__), "patterns.txt"), "r", encoding="utf-8") as fp:
-            for line in fp.readlines():
-                line = line.strip("\n").split("\t")
-                if len(line) == 2:
-                    pattern = tuple(line[1].split(","))
-                    self.patterns[pattern] = line[0]
+    @classmethod
+    def _load_patterns(cls):
+        """ Load GlyphIndex from patterns file, only once for all instances. """
+        with cls._patterns_lock:
+            if cls.patterns is None:
+                cls.patterns = GlyphIndex.from_file(os.path.join(os.path.dirname(__file__), "patterns.txt"))
 
     def _match_pattern(self, pattern):
-        return self.patterns.get(pattern, None)
-
-    def _process_page(self, data):
-        dd_threads = {}
-        for code in _pcre("seek_dd").findall(data):
-            if code not in dd_threads:
-                url = "http://www.geocaching.com/ImgGen/seek/CacheDir.ashx?k={0}".format(code)
-                thread = ImageDownloader(url, self.http)
-                thread.start()
-                dd_threads[code] = thread
-        dts_threads = {}
-        for code in _pcre("seek_dts").findall(data):
-            if code not in dts_threads:
-                url = "http://www.geocaching.com/ImgGen/seek/CacheInfo.ashx?v={0}".format(code)
-                thread = ImageDownloader(url, self.http)
-                thread.start()
-                dts_threads[code] = thread
-        count = self._parse_count(data)
-        post_data = self._parse_post_data(data)
-        self._dd = {}
-        for code in dd_threads:
-            dd_threads[code].join()
-            self._dd[code] = dd_threads[code].image
-        self._dts = {}
-        for code in dts_threads:
-            dts_threads[code].join()
-            self._dts[code] = dts_threads[code].image
-        caches = self._parse_caches(data)
-        return count, caches, post_data
+        return self.patterns.match(pattern)
+
+    _memo = None
+
+    @classmethod
+    def _get_memo(cls):
+        """ Return OCRMemo in the current data directory. """
+        # The data directory is shared with the HTTP interfaces, which do not
+        # all implement get_data_dir.
+        data_dir = HTTPInterface.get_data_dir()
+        filename = None if data_dir is None else os.path.join(data_dir, "ocr_codes.txt")
+        if cls._memo is None or cls._memo.filename != filename:
+            cls._memo = OCRMemo(filename)
+        return cls._memo
+
+    _dd_url = "http://www.geocaching.com/ImgGen/seek/CacheDir.ashx?k={0}"
+    _dts_url = "http://www.geocaching.com/ImgGen/seek/CacheInfo.ashx?v={0}"
+
+    def _process_page(self, data, codes=None):
+        if codes is None:
+            codes, unknown = self._lookup_codes(data)
+            if len(unknown) > 0:
+                self._store_images(unknown, self.images.fetch(unknown))
+        return SeekCache._process_page(self, data, codes)
+
+    def _lookup_codes(self, data):
+        """
+        Return tuple (codes, unknown) for the page. Codes are dictionaries
+        kind -> code -> decoded values known by OCRMemo, unknown is dictionary
+        url -> (dictionary of the kind, code) of images to download.
+
+        """
+        memo = self._get_memo()
+        codes = {"dd":{}, "dts":{}}
+        unknown = {}
+        for kind, url in (("dd", self._dd_url), ("dts", self._dts_url)):
+            for code in _pcre("seek_" + kind).findall(data):
+                known = memo.get(kind, code)
+                if known is not None:
+                    codes[kind][code] = known
+                else:
+                    unknown[url.format(code)] = (codes[kind], code)
+        if len(unknown) > 0:
+            self._log.debug("Downloading {0} unknown images.".format(len(unknown)))
+        return codes, unknown
+
+    def _store_images(self, unknown, images):
+        """ Set downloaded images of the codes, images is dictionary url -> Image. """
+        for url, (codes, code) in unknown.items():
+            codes[code] = images[url]
 
-    def _parse_cache_record(self, data):
+    def _parse_cache_record(self, data, codes=None):
         cache = SeekCache._parse_cache_record(self, data)
         match = _pcre("seek_dd").search(data[1])
         if match is not None:
-            dd = self._get_dd(match.group(1))
+            dd = self._get_dd(codes["dd"], match.group(1))
             if dd is not None:
                 cache["distance"], cache["direction"] = dd
-                self._log.log_parser("direction = {0}".format(cache["direction"]))
-                self._log.log_parser("distance = {0:.4f} km".format(cache["distance"]))
+                self._log.log_parser("direction = {0}", cache["direction"])
+                self._log.log_parser("distance = {0:.4f} km", cache["distance"])
             else:
                 self._log.error("Unknown DD image - unable to get direction, distance.")
         match = _pcre("seek_dts").search(data[6])
         if match is not None:
-            dts = self._get_dts(match.group(1))
+            dts = self._get_dts(codes["dts"], match.group(1))
             if dts is not None:
                 cache["difficulty"], cache["terrain"], cache["size"] = dts
-                self._log.log_parser("difficulty = {0}".format(cache["difficulty"]))
-                self._log.log_parser("terrain = {0}".format(cache["terrain"]))
-                self._log.log_parser("size = {0}".format(cache["size"]))
+                self._log.log_parser("difficulty = {0}", cache["difficulty"])
+                self._log.log_parser("terrain = {0}", cache["terrain"])
+                self._log.log_parser("size = {0}", cache["size"])
             else:
                 self._log.error("Unknown DTS image - unable to get difficulty, terrain, size.")
         else:
             self._log.error("Difficulty, terrain, size not found.")
         return cache
 
-    def _get_dts(self, code):
-        if isinstance(self._dts[code], Image):
+    def _get_dts(self, codes, code):
+        if isinstance(codes[code], Image):
             empty = lambda x: x.a < 100
-            img = self._dts[code].vsplit(empty=empty)
-            self._dts[code] = None
+            img = codes[code].vsplit(empty=empty)
+            codes[code] = None
             if len(img) != 2:
                 self._log.debug("DTS image does not have 2 parts.")
                 return None
@@ -1376,14 +3588,15 @@ class SeekCacheOCR(SeekCache):
                 self._log.debug("Unknown pattern.")
                 return None
             # Result
-            self._dts[code] = (diff, terr, size)
-        return self._dts[code]
+            codes[code] = (diff, terr, size)
+            self._get_memo().add("dts", code, codes[code])
+        return codes[code]
 
-    def _get_dd(self, code):
-        if isinstance(self._dd[code], Image):
+    def _get_dd(self, codes, code):
+        if isinstance(codes[code], Image):
             empty = lambda x: x.a < 100
-            img = self._dd[code].vsplit(empty=empty)
-            self._dd[code] = None
+            img = codes[code].vsplit(empty=empty)
+            codes[code] = None
             if len(img) != 2:
                 self._log.debug("DD image does not have 2 parts.")
                 return None
@@ -1419,17 +3632,39 @@ class SeekCacheOCR(SeekCache):
             else:
                 self._log.debug("Invalid distance value.")
                 return None
-            self._dd[code] = (distance, direction)
-        return self._dd[code]
+            codes[code] = (distance, direction)
+            self._get_memo().add("dd", code, codes[code])
+        return codes[code]
 
 
 class SeekResult(Sequence):
     """
     Sequence wrapper for a result of seek query with lazy loading of next pages.
 
+    Caches are kept by pages. Indexing and slicing load only the pages up to
+    the requested index. stream() discards every page once it is read, so
+    sweeps over large result run in constant memory, and cursor allows to
+    continue the sweep later by SeekCache.resume. The sweep continues from
+    the beginning of the page being read, so its caches may be read twice.
+
+    With prefetch, the next pages are downloaded in a background thread while
+    the current one is being read. The downloads go through the parser's HTTP
+    interface, so they respect its rate limiter. Iteration stopped early, or
+    explicit close, cancels the pages not yet requested.
+
+    Attributes:
+        cursor      --- SeekCursor of the first page not discarded, None if all
+                        pages are discarded.
+
+    Methods:
+        stream      --- Iterate over caches, discard pages once read.
+        close       --- Stop downloading pages in the background.
+
     """
 
-    def __init__(self, caches, count, url, post_data, parser):
+    _page_size = 20
+
+    def __init__(self, caches, count, url, post_data, parser, prefetch=0, offset=0):
         """
         Arguments:
             caches      --- Initial set of caches.
@@ -1438,79 +3673,196 @@ class SeekResult(Sequence):
             post_data   --- POST data for future downloads.
             parser      --- Parser object.
 
+        Keyworded arguments:
+            prefetch    --- Number of pages downloaded ahead in the background.
+            offset      --- Index of the first cache in caches.
+
         """
         self._log = logging.getLogger("gcparser.SeekResult")
         self._count = count
-        self._caches = list(caches)
-        if len(self._caches) not in (self._count, 20):
-            self._log.critical("Seems like I missed some caches in the list, got only {0} caches on first page out of total {1}.".format(len(self._caches), self._count))
+        caches = list(caches)
+        if offset == 0 and len(caches) not in (self._count, self._page_size):
+            self._log.critical("Seems like I missed some caches in the list, got only {0} caches on first page out of total {1}.".format(len(caches), self._count))
+        # Retained pages as lists of caches, and indices of their first caches
+        self._pages = []
+        self._starts = []
+        self._requests = []
+        self._discarded = offset
+        self._loaded = offset
         self._url = url
+        if len(caches) > 0:
+            # The first page was downloaded without POST data
+            self._add_page(caches, None)
         self._post_data = post_data
         self._parser = parser
+        self._prefetch = prefetch
+        self._condition = threading.Condition()
+        self._thread = None
+        self._error = None
+        self._closed = False
+        self._wanted = offset
+        self._schedule_prefetch()
+
+    @property
+    def cursor(self):
+        with self._condition:
+            if len(self._pages) > 0:
+                return SeekCursor(self._url, self._requests[0], self._starts[0], self._count)
+            if self._loaded >= self._count:
+                return None
+            return SeekCursor(self._url, self._post_data, self._loaded, self._count)
+
+    def _add_page(self, caches, request):
+        self._pages.append(caches)
+        self._starts.append(self._loaded)
+        self._requests.append(request)
+        self._loaded += len(caches)
 
     def _load_next_page(self):
-        count, caches, post_data = self._parser._get_page(self._url, self._post_data)
-        if not (len(caches) == 20 or len(caches) + len(self._caches) == self._count):
-            self._log.critical("Seems like I missed some caches in the list, got only {0} caches on this page, total {1} caches out of {2}.".format(len(caches), len(caches)+len(self._caches), self._count))
-        self._post_data = post_data
-        self._caches.extend(caches)
+        request = self._post_data
+        count, caches, post_data = self._parser._get_page(self._url, request)
+        with self._condition:
+            if not (len(caches) == self._page_size or len(caches) + self._loaded == self._count):
+                self._log.critical("Seems like I missed some caches in the list, got only {0} caches on this page, total {1} caches out of {2}.".format(len(caches), len(caches)+self._loaded, self._count))
+            if len(caches) == 0:
+                raise IndexError("No caches on the page at index {0} out of {1}.".format(self._loaded, self._count))
+            self._post_data = post_data
+            self._add_page(caches, request)
+            self._condition.notify_all()
+
+    def _discard(self, index):
+        """ Discard pages with all caches before index. """
+        with self._condition:
+            while len(self._pages) > 0 and self._starts[0] + len(self._pages[0]) <= index:
+                self._discarded = self._starts[0] + len(self._pages[0])
+                del self._pages[0]
+                del self._starts[0]
+                del self._requests[0]
+
+    def _prefetch_limit(self):
+        """ Return number of caches that should be loaded for current position. """
+        pages = self._wanted // self._page_size + 1 + self._prefetch
+        return min(self._count, pages * self._page_size)
+
+    def _schedule_prefetch(self):
+        """ Start background download, if some pages are missing in the read-ahead window. """
+        if self._prefetch <= 0:
+            return
+        with self._condition:
+            if self._closed or self._thread is not None or self._error is not None:
+                return
+            if self._loaded >= self._prefetch_limit():
+                return
+            self._thread = threading.Thread(target=self._prefetch_pages)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _prefetch_pages(self):
+        """ Download pages until the read-ahead window is full, or closed. """
+        try:
+            while True:
+                with self._condition:
+                    if self._closed or self._loaded >= self._prefetch_limit():
+                        return
+                self._load_next_page()
+        except Exception as e:
+            self._log.debug("Background download of the next page failed: {0}".format(e))
+            with self._condition:
+                self._error = e
+        finally:
+            with self._condition:
+                self._thread = None
+                self._condition.notify_all()
+
+    def _wait_for_page(self):
+        """ Wait for the page being downloaded in the background, or download it now. """
+        with self._condition:
+            if self._thread is not None:
+                self._condition.wait()
+                return
+            if self._error is not None:
+                error, self._error = self._error, None
+                raise error
+        self._load_next_page()
+
+    def close(self):
+        """
+        Stop downloading pages in the background, the page being downloaded is
+        finished. Pages are loaded synchronously on access after close.
+
+        """
+        with self._condition:
+            self._closed = True
+
+    def stream(self):
+        """
+        Iterate over caches from the first one not discarded yet, discard every
+        page once all its caches are read.
+
+        """
+        index = self._discarded
+        try:
+            while index < self._count:
+                cache = self[index]
+                index += 1
+                self._discard(index)
+                yield cache
+        finally:
+            if self._loaded < self._count:
+                self.close()
 
     def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
         if not isinstance(index, int):
             raise IndexError
         if index < 0:
             index += len(self)
-        if 0 <= index < len(self):
-            while index >= len(self._caches):
-                self._load_next_page()
-            return self._caches[index]
-        else:
+        if not 0 <= index < len(self):
             raise IndexError
+        if index < self._discarded:
+            raise IndexError("Cache at index {0} was already discarded.".format(index))
+        self._wanted = max(self._wanted, index)
+        while index >= self._loaded:
+            self._wait_for_page()
+        self._schedule_prefetch()
+        with self._condition:
+            page = bisect_right(self._starts, index) - 1
+            return self._pages[page][index - self._starts[page]]
+
+    def __iter__(self):
+        try:
+            for index in range(len(self)):
+                yield self[index]
+        finally:
+            if self._loaded < self._count:
+                self.close()
 
     def __len__(self):
         return self._count
 
 
-class ImageDownloader(threading.Thread):
-    """
-    Thread for downloading images.
-
-    Attributes:
-        data        --- Downloaded data.
-        image       --- Downloaded image as Image instance.
-
-    """
-
-    def __init__(self, url, http):
-        """
-        Arguments:
-            url     --- URL of the image.
-            http    --- HTTP interface object.
-
-        """
-        self.http = http
-        self.url = url
-        self.data = None
-        self.image = None
-        threading.Thread.__init__(self)
-
-    def run(self):
-        opener = self.http.build_opener()
-        self.data = self.http.download_url(opener, self.url).read()
-        try:
-            self.image = Image.from_data(self.data)
-        except Exception as e:
-            self.image = Image()
+def _transparent(pixel):
+    """ Default predicate of Image methods, fully transparent pixel is empty. """
+    return pixel.a == 0
 
 
 class Image:
     """
     Basic image manipulation.
 
+    The pixels are stored as one bytes object with RGBA8 data. For every
+    predicate deciding about empty pixels a plane of filled (1) and empty (0)
+    pixels is computed once, evaluating the predicate only once per color.
+    The planes are passed on to the images created by cut, so splitting and
+    bitmask generation are only slice operations. Use the same predicate
+    object for all calls on an image and its parts to reuse the planes.
+
     Attributes:
         RGBA        --- Namedtuple for representing RGBA colors.
         width       --- Width of the image.
         height      --- Height of the image.
+        data        --- Pixel data as bytes, 4 bytes RGBA per pixel, row by row.
         pixels      --- pixel data as [[pixel1_1, pixel2_1], [pixel1_2, pixel2_2]].
 
     Methods:
@@ -1530,10 +3882,12 @@ class Image:
 
     RGBA = namedtuple("RGBA", "r g b a")
 
+    _pixel_type = "I" if array("I").itemsize == 4 else "L"
+
     def __init__(self, pixels=[]):
         """
         Arguments:
-            pixels  --- Pixel data.
+            pixels  --- Pixel data as [[pixel1_1, pixel2_1], [pixel1_2, pixel2_2]].
 
         """
         if len(pixels) > 0:
@@ -1542,7 +3896,18 @@ class Image:
         else:
             self.width = 0
             self.height = 0
-        self.pixels = pixels
+        self.data = bytes(value for row in pixels for pixel in row for value in pixel)
+        self._masks = {}
+
+    @classmethod
+    def _from_rgba(cls, width, height, data, masks={}):
+        """ Create image instance from RGBA8 bytes and already computed planes. """
+        image = cls.__new__(cls)
+        image.width = width
+        image.height = height
+        image.data = data
+        image._masks = dict(masks)
+        return image
 
     @classmethod
     def from_data(cls, data):
@@ -1566,17 +3931,50 @@ class Image:
         reader = png.Reader(bytes=data).asRGBA8()
         width = reader[0]
         height = reader[1]
+        rows = [bytes(row) for row in reader[2]]
+        if len(rows) != height or len(rows[-1]) != width*4:
+            raise ValueError("Invalid image data.")
+        return cls._from_rgba(width, height, b"".join(rows))
+
+    @property
+    def pixels(self):
+        RGBA = self.RGBA
+        data = self.data
         pixels = []
-        for rowData in reader[2]:
+        for y in range(self.height):
             row = []
-            for i in range(0, len(rowData), 4):
-                row.append(cls.RGBA(rowData[i], rowData[i+1], rowData[i+2], rowData[i+3]))
+            for i in range(y*self.width*4, (y+1)*self.width*4, 4):
+                row.append(RGBA(data[i], data[i+1], data[i+2], data[i+3]))
             pixels.append(row)
-        if len(pixels) != height or len(pixels[-1]) != width:
-            raise ValueError("Invalid image data.")
-        return cls(pixels)
-
-    def bitmask(self, empty=lambda x: x.a == 0, chars=" X"):
+        return pixels
+
+    def _mask(self, empty):
+        """ Return plane of filled (1) and empty (0) pixels as bytes. """
+        mask = self._masks.get(empty)
+        if mask is None:
+            values = array(self._pixel_type)
+            values.frombytes(self.data)
+            RGBA = self.RGBA
+            table = {}
+            for value in set(values):
+                pixel = RGBA(*value.to_bytes(4, sys.byteorder))
+                table[value] = 0 if empty(pixel) else 1
+            mask = bytes(map(table.__getitem__, values))
+            self._masks[empty] = mask
+        return mask
+
+    def _filled_rows(self, empty):
+        """ Return list of True for rows with some filled pixel. """
+        mask = self._mask(empty)
+        width = self.width
+        return [1 in mask[y*width:(y+1)*width] for y in range(self.height)]
+
+    def _filled_columns(self, empty):
+        """ Return list of True for columns with some filled pixel. """
+        mask = self._mask(empty)
+        return [1 in mask[x::self.width] for x in range(self.width)]
+
+    def bitmask(self, empty=_transparent, chars=" X"):
         """
         Return tuple of strings (rows of the image) with each pixel represented by
         a character as empty or filled.
@@ -1586,17 +3984,13 @@ class Image:
             chars       --- Sequence containing characters for empty and filled pixels.
 
         """
-        mask = []
-        for y in range(self.height):
-            row = ""
-            for x in range(self.width):
-                px = self.pixels[y][x]
-                if empty(px):
-                    row += chars[0]
-                else:
-                    row += chars[1]
-            mask.append(row)
-        return tuple(mask)
+        mask = self._mask(empty)
+        width = self.width
+        try:
+            table = bytes.maketrans(b"\x00\x01", (chars[0] + chars[1]).encode("latin-1"))
+        except UnicodeEncodeError:
+            return tuple("".join(chars[value] for value in mask[y*width:(y+1)*width]) for y in range(self.height))
+        return tuple(mask[y*width:(y+1)*width].translate(table).decode("latin-1") for y in range(self.height))
 
     def cut(self, left, top, right, bottom):
         """
@@ -1609,15 +4003,25 @@ class Image:
             bottom  --- Bottom border coordinate.
 
         """
-        pixels = []
-        for y in range(max(top, 0), min(bottom+1, self.height)):
-            row = []
-            for x in range(max(left, 0), min(right+1, self.width)):
-                row.append(self.pixels[y][x])
-            pixels.append(row)
-        return type(self)(pixels)
+        left = max(left, 0)
+        right = min(right+1, self.width)
+        rows = range(max(top, 0), min(bottom+1, self.height))
+        if left >= right or len(rows) == 0:
+            return type(self)()
+        width = self.width
+        masks = {}
+        if left == 0 and right == width:
+            # Whole rows are one contiguous slice
+            data = self.data[rows[0]*width*4:(rows[-1]+1)*width*4]
+            for empty, mask in self._masks.items():
+                masks[empty] = mask[rows[0]*width:(rows[-1]+1)*width]
+        else:
+            data = b"".join([self.data[(y*width+left)*4:(y*width+right)*4] for y in rows])
+            for empty, mask in self._masks.items():
+                masks[empty] = b"".join([mask[y*width+left:y*width+right] for y in rows])
+        return self._from_rgba(right-left, len(rows), data, masks)
 
-    def vstrip(self, empty=lambda x: x.a == 0):
+    def vstrip(self, empty=_transparent):
         """
         Create a new Image instance without empty rows on top and bottom side.
 
@@ -1625,20 +4029,12 @@ class Image:
             empty       --- Function returning True, if the pixel is considered empty.
 
         """
-        top = self.height-1
-        bottom = 0
-        for y in range(self.height):
-            is_empty = True
-            for x in range(self.width):
-                if not empty(self.pixels[y][x]):
-                    is_empty = False
-                    break
-            if not is_empty:
-                top = min(y, top)
-                bottom = max(y, bottom)
-        return self.cut(0, top, self.width-1, bottom)
+        filled = [y for y, is_filled in enumerate(self._filled_rows(empty)) if is_filled]
+        if len(filled) == 0:
+            return type(self)()
+        return self.cut(0, filled[0], self.width-1, filled[-1])
 
-    def hstrip(self, empty=lambda x: x.a == 0):
+    def hstrip(self, empty=_transparent):
         """
         Create a new Image instance without empty columns on left and right side.
 
@@ -1646,20 +4042,12 @@ class Image:
             empty       --- Function returning True, if the pixel is considered empty.
 
         """
-        left = self.width-1
-        right = 0
-        for x in range(self.width):
-            is_empty = True
-            for y in range(self.height):
-                if not empty(self.pixels[y][x]):
-                    is_empty = False
-                    break
-            if not is_empty:
-                left = min(x, left)
-                right = max(x, right)
-        return self.cut(left, 0, right, self.height-1)
+        filled = [x for x, is_filled in enumerate(self._filled_columns(empty)) if is_filled]
+        if len(filled) == 0:
+            return type(self)()
+        return self.cut(filled[0], 0, filled[-1], self.height-1)
 
-    def strip(self, empty=lambda x: x.a == 0):
+    def strip(self, empty=_transparent):
         """
         Create a new Image instance without empty columns and rows on the sides.
 
@@ -1669,7 +4057,21 @@ class Image:
         """
         return self.vstrip(empty=empty).hstrip(empty=empty)
 
-    def vsplit(self, empty=lambda x: x.a == 0):
+    def _runs(self, filled):
+        """ Return list of (first, last) indices of runs of True values. """
+        runs = []
+        first = None
+        for i, is_filled in enumerate(filled):
+            if is_filled and first is None:
+                first = i
+            elif not is_filled and first is not None:
+                runs.append((first, i-1))
+                first = None
+        if first is not None:
+            runs.append((first, len(filled)-1))
+        return runs
+
+    def vsplit(self, empty=_transparent):
         """
         Create a sequence of new Image instances from parts of the image separated by
         empty rows.
@@ -1678,30 +4080,9 @@ class Image:
             empty       --- Function returning True, if the pixel is considered empty.
 
         """
-        parts = []
-        top = None
-        bottom = None
-        for y in range(self.height):
-            is_empty = True
-            for x in range(self.width):
-                if not empty(self.pixels[y][x]):
-                    is_empty = False
-                    break
-            if not is_empty:
-                if top is None:
-                    top = y
-                    bottom = y
-                else:
-                    bottom = y
-            elif top is not None:
-                parts.append(self.cut(0, top, self.width-1, bottom))
-                top = None
-                bottom = None
-        if top is not None:
-            parts.append(self.cut(0, top, self.width-1, bottom))
-        return parts
+        return [self.cut(0, top, self.width-1, bottom) for top, bottom in self._runs(self._filled_rows(empty))]
 
-    def hsplit(self, empty=lambda x: x.a == 0):
+    def hsplit(self, empty=_transparent):
         """
         Create a sequence of new Image instances from parts of the image separated by
         empty columns.
@@ -1710,28 +4091,7 @@ class Image:
             empty       --- Function returning True, if the pixel is considered empty.
 
         """
-        parts = []
-        left = None
-        right = None
-        for x in range(self.width):
-            is_empty = True
-            for y in range(self.height):
-                if not empty(self.pixels[y][x]):
-                    is_empty = False
-                    break
-            if not is_empty:
-                if left is None:
-                    left = x
-                    right = x
-                else:
-                    right = x
-            elif left is not None:
-                parts.append(self.cut(left, 0, right, self.height-1))
-                left = None
-                right = None
-        if left is not None:
-            parts.append(self.cut(left, 0, right, self.height-1))
-        return parts
+        return [self.cut(left, 0, right, self.height-1) for left, right in self._runs(self._filled_columns(empty))]
 
 
 ########################################
@@ -1755,7 +4115,7 @@ class Profile(BaseParser):
         Update user's geocaching.com profile.
 
         """
-        data = self.http.request("http://www.geocaching.com/account/editprofiledetails.aspx", auth=True)
+        data = self.http.request("http://www.geocaching.com/account/editprofiledetails.aspx", auth=True, cache=False)
         post_data = {}
         for hidden_input in _pcre("hidden_input").findall(data):
             post_data[hidden_input[0]] = hidden_input[1]
@@ -0,0 +1,647 @@
+# -*- coding: utf-8 -*-
+"""
+Asynchronous (asyncio) interface to geocaching.com website built on top of
+gcparser. Requires Python 3.6 or newer.
+
+Classes:
+    AsyncHTTPInterface      --- Asynchronous counterpart of HTTPInterface, shares
+                                its cookies, rate limiters, stored pages and stats.
+    AsyncResponse           --- Response downloaded by AsyncHTTPInterface.
+    AsyncCacheDetails       --- CacheDetails with coroutine get and asynchronous
+                                generator get_many.
+    AsyncMyGeocachingLogs   --- MyGeocachingLogs with coroutine get and get_finds.
+    AsyncSeekCache          --- SeekCache with coroutine get.
+    AsyncSeekCacheOCR       --- SeekCacheOCR with coroutine get, images are
+                                downloaded concurrently on the event loop.
+    AsyncSeekResult         --- Asynchronous iterator over a result of seek query
+                                with lazy loading of next pages.
+
+"""
+
+__author__ = "Petr Morávek (xificurk@gmail.com)"
+__copyright__ = "Copyright (C) 2009-2011 Petr Morávek"
+__license__ = "GPL"
+
+import asyncio
+from collections import defaultdict
+import email.parser
+from functools import partial
+import http.client
+import logging
+import ssl
+from time import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from gcparser import HTTPInterface, StaticClass, ContentEncodingProcessor, CacheDetails, MyGeocachingLogs, SeekCache, SeekCacheOCR, Image, LoginError, ReplayError, DownloadError, _decode_content
+
+
+__all__ = ["AsyncHTTPInterface",
+           "AsyncResponse",
+           "AsyncCacheDetails",
+           "AsyncMyGeocachingLogs",
+           "AsyncSeekCache",
+           "AsyncSeekCacheOCR",
+           "AsyncSeekResult"]
+
+
+
+############################################################
+### HTTP interface.                                      ###
+############################################################
+
+class AsyncResponse:
+    """
+    Response downloaded by AsyncHTTPInterface.
+
+    Attributes:
+        url         --- URL of the response.
+        code        --- HTTP status code.
+        reason      --- HTTP status reason phrase.
+        headers     --- Response headers as http.client.HTTPMessage.
+        body        --- Response body as bytes.
+
+    Methods:
+        info        --- Return response headers.
+        read        --- Return response body.
+
+    """
+
+    def __init__(self, url, code, reason, headers, body):
+        self.url = url
+        self.code = code
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+
+    def info(self):
+        """
+        Return response headers.
+
+        """
+        return self.headers
+
+    def read(self):
+        """
+        Return response body.
+
+        """
+        return self.body
+
+
+class AsyncHTTPInterface(StaticClass):
+    """
+    Asynchronous counterpart of HTTPInterface. Cookies, user agent, rate
+    limiters, stored pages, page archive and download stats are shared with
+    HTTPInterface, persistent connections are kept per event loop with the
+    limits of HTTPInterface.pool. Cannot be instantionalized.
+
+    Attributes:
+        timeout         --- Timeout of a single HTTP exchange in seconds.
+        max_redirects   --- Maximum number of followed redirects.
+
+    Methods:
+        request         --- Retrive/send data from/to geocaching.com website.
+        download_url    --- Download data from URL.
+        fetch           --- Download data from any URL without rate limiting
+                            and retries.
+        wait            --- Handle wait time to lessen the load on
+                            geocaching.com website.
+
+    """
+
+    _log = logging.getLogger("gcparser.http.async")
+    _idle = defaultdict(list)
+    _ssl_context = None
+    _login_lock = None
+
+    timeout = 60
+    max_redirects = 10
+
+    @classmethod
+    async def request(cls, url, auth=False, data=None, check=True, cache=True):
+        """
+        Retrive/send data from/to geocaching.com website.
+
+        Arguments:
+            url         --- Webpage URL.
+
+        Keyworded arguments:
+            auth        --- Authenticate before request.
+            data        --- Data to send with request.
+            check       --- Re-check if we're logged in after download.
+            cache       --- Use the stored page, if it's fresh enough, store
+                            the downloaded page (used only if data is None).
+
+        """
+        if HTTPInterface.replay:
+            return await cls._blocking(HTTPInterface._replay_page, url, data)
+        webpage = await cls._download_page(url, auth, data, check, cache)
+        await cls._blocking(HTTPInterface._archive_page, url, data, webpage)
+        return webpage
+
+    @classmethod
+    async def _blocking(cls, function, *args):
+        """ Run function doing blocking file or database I/O in the default executor. """
+        return await asyncio.get_event_loop().run_in_executor(None, partial(function, *args))
+
+    @classmethod
+    async def _download_page(cls, url, auth, data, check, cache):
+        """ Return the page from ResponseCache or download it. """
+        key, stored = await cls._blocking(HTTPInterface._lookup_response, url, auth, data, cache)
+        if stored is not None and stored.time + HTTPInterface.response_max_age > time():
+            cls._log.debug("Using stored page '{0}'.".format(url))
+            return stored.body
+        cookies = None
+        if auth:
+            cookies = await cls._get_cookies()
+        relogged = False
+        while True:
+            await cls.wait(auth)
+            response = await cls.download_url(url, data, headers=HTTPInterface._conditional_headers(stored), cookies=cookies)
+            if auth:
+                await cls._blocking(HTTPInterface._count_download)
+            if stored is not None and response.code == 304:
+                cls._log.debug("Page '{0}' not modified, using stored version.".format(url))
+                await cls._blocking(HTTPInterface._responses.touch, key, stored)
+                return stored.body
+            webpage = response.body.decode("utf-8")
+            if auth and check and not HTTPInterface._check_login(webpage):
+                if relogged:
+                    cls._log.critical("Still not logged in after refreshing login.")
+                    raise LoginError("Cannot log in.")
+                cls._log.debug("We're not actually logged in, refreshing login and redownloading page.")
+                await cls._login()
+                relogged = True
+                continue
+            await cls._blocking(HTTPInterface._store_response, key, url, webpage, response.info())
+            return webpage
+
+    @classmethod
+    async def download_url(cls, url, data=None, headers=None, cookies=None, policy=None):
+        """
+        Download data from URL, return AsyncResponse. Failed downloads are
+        retried according to the retry policy, raise DownloadError when giving
+        up.
+
+        Arguments:
+            url         --- URL to download.
+
+        Keyworded arguments:
+            data        --- POST data.
+            headers     --- Additional request headers.
+            cookies     --- CookieJar to use.
+            policy      --- RetryPolicy, HTTPInterface.retry_policy by default.
+
+        """
+        cls._log.debug("Downloading page '{0}'.".format(url))
+        post_data = None
+        if data is not None:
+            post_data = urllib.parse.urlencode(data).encode("utf-8")
+        if policy is None:
+            policy = HTTPInterface.retry_policy
+        start = time()
+        attempt = 0
+        while True:
+            attempt += 1
+            policy.check()
+            try:
+                response = await cls._open(url, post_data, headers or {}, cookies)
+            except IOError as e:
+                await asyncio.sleep(policy.failure(e, url, attempt, start))
+                continue
+            policy.success()
+            return response
+
+    @classmethod
+    async def fetch(cls, url, data=None, timeout=20):
+        """
+        Download data from any URL without rate limiting and retries, return
+        AsyncResponse, or None on error.
+
+        Arguments:
+            url         --- URL to download.
+
+        Keyworded arguments:
+            data        --- POST data.
+            timeout     --- Timeout in seconds.
+
+        """
+        cls._log.debug("Downloading {0}".format(url))
+        if data is not None:
+            data = urllib.parse.urlencode(data).encode("utf-8")
+        try:
+            response = await asyncio.wait_for(cls._open(url, data, {}, None), timeout)
+        except (IOError, asyncio.TimeoutError):
+            cls._log.error("Could not fetch URL {0}.".format(url))
+            return None
+        return response
+
+    @classmethod
+    async def wait(cls, auth):
+        """
+        Handle wait time to lessen the load on geocaching.com website.
+
+        Arguments:
+            auth        --- Is this for a page where autentication is needed?
+
+        """
+        if auth:
+            delay = HTTPInterface.rate_limiter.reserve()
+        else:
+            delay = HTTPInterface.anonymous_rate_limiter.reserve()
+        cls._log.debug("Waiting for {0:.1f} seconds.".format(delay))
+        await asyncio.sleep(delay)
+
+    @classmethod
+    async def _get_cookies(cls):
+        """ Get cookies shared with HTTPInterface, log in if needed. """
+        if HTTPInterface._cookies is None:
+            await cls._blocking(HTTPInterface._get_cookies, False)
+            if not HTTPInterface._has_login_cookie():
+                await cls._login()
+        return HTTPInterface._cookies
+
+    @classmethod
+    async def _login(cls):
+        """ Log in to geocaching.com. """
+        if cls._login_lock is None:
+            cls._login_lock = asyncio.Lock()
+        async with cls._login_lock:
+            if not await cls._login_attempt():
+                cls._log.debug("Not logged in, re-trying.")
+                if not await cls._login_attempt():
+                    cls._log.critical("Login error.")
+                    raise LoginError("Cannot log in.")
+            cls._log.debug("Logged in.")
+
+    @classmethod
+    async def _login_attempt(cls):
+        """ Attempt to log in to geocaching.com. """
+        cls._log.debug("Attempting to log in.")
+        credentials = HTTPInterface._credentials
+        if credentials.username is None or credentials.password is None:
+            raise LoginError("Cannot log in - no credentials available.")
+        webpage = await cls.request(HTTPInterface._login_url, auth=True, check=False, cache=False)
+        await cls.request(HTTPInterface._login_url, data=HTTPInterface._login_data(webpage), auth=True, check=False)
+        return HTTPInterface._has_login_cookie()
+
+    @classmethod
+    async def _open(cls, url, data, headers, cookies):
+        """ Send the request, follow redirects, handle cookies. """
+        if HTTPInterface.replay:
+            raise ReplayError("Cannot download '{0}' in replay mode.".format(url))
+        for i in range(cls.max_redirects + 1):
+            request = urllib.request.Request(url, data, dict(headers))
+            for name, value in HTTPInterface._default_headers():
+                if not request.has_header(name.capitalize()):
+                    request.add_header(name, value)
+            if not request.has_header("Accept-encoding"):
+                request.add_header("Accept-Encoding", ContentEncodingProcessor.accept_encoding)
+            if cookies is not None:
+                cookies.add_cookie_header(request)
+            response = await cls._send(request)
+            if cookies is not None:
+                cookies.extract_cookies(response, request)
+            if response.code in (301, 302, 303, 307) and "Location" in response.headers:
+                url = urllib.parse.urljoin(url, response.headers["Location"])
+                if response.code != 307:
+                    data = None
+                continue
+            if response.code >= 400:
+                raise urllib.error.HTTPError(response.url, response.code, response.reason, response.headers, None)
+            return response
+        raise urllib.error.URLError("Too many redirects.")
+
+    @classmethod
+    async def _send(cls, request):
+        """ Send the request over pooled connection and read the whole response. """
+        parts = urllib.parse.urlsplit(request.full_url)
+        if not parts.hostname:
+            raise urllib.error.URLError("no host given")
+        method = request.get_method()
+        headers = dict(request.unredirected_hdrs)
+        headers.update((name, value) for name, value in request.headers.items() if name not in headers)
+        headers = dict((name.title(), value) for name, value in headers.items())
+        headers["Host"] = parts.netloc
+        headers["Connection"] = "keep-alive"
+        if request.data is not None:
+            headers.setdefault("Content-Type", "application/x-www-form-urlencoded")
+            headers["Content-Length"] = str(len(request.data))
+        head = "{0} {1} HTTP/1.1\r\n".format(method, request.selector)
+        head += "".join("{0}: {1}\r\n".format(name, value) for name, value in headers.items())
+        head = (head + "\r\n").encode("iso-8859-1") + (request.data or b"")
+
+        key = (asyncio.get_event_loop(), parts.scheme, parts.hostname, parts.port)
+        while True:
+            reader, writer, reused = await cls._connect(key)
+            try:
+                writer.write(head)
+                await writer.drain()
+                response, keep_alive = await asyncio.wait_for(cls._read_response(reader, method, request.full_url), cls.timeout)
+            except (IOError, EOFError, asyncio.TimeoutError, http.client.HTTPException, ValueError) as e:
+                writer.close()
+                if reused:
+                    # The server has probably dropped the idle connection, try another one.
+                    continue
+                raise urllib.error.URLError(e)
+            break
+        if keep_alive:
+            cls._release(key, reader, writer)
+        else:
+            writer.close()
+        return response
+
+    @classmethod
+    async def _connect(cls, key):
+        """ Return tuple (reader, writer, reused) with connection to the host. """
+        idle = cls._idle[key]
+        while len(idle) > 0:
+            reader, writer, released = idle.pop()
+            if released + HTTPInterface.pool.idle_timeout > time() and not reader.at_eof():
+                cls._log.debug("Re-using connection to '{0}://{1}'.".format(key[1], key[2]))
+                return reader, writer, True
+            writer.close()
+        loop, scheme, host, port = key
+        context = None
+        if scheme == "https":
+            if cls._ssl_context is None:
+                cls._ssl_context = ssl.create_default_context()
+            context = cls._ssl_context
+            port = port or 443
+        else:
+            port = port or 80
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port, ssl=context), cls.timeout)
+        except (IOError, asyncio.TimeoutError) as e:
+            raise urllib.error.URLError(e)
+        return reader, writer, False
+
+    @classmethod
+    def _release(cls, key, reader, writer):
+        """ Return connection to the pool for re-use. """
+        idle = cls._idle[key]
+        if len(idle) < HTTPInterface.pool.size:
+            idle.append((reader, writer, time()))
+        else:
+            writer.close()
+
+    @classmethod
+    async def _read_response(cls, reader, method, url):
+        """ Read response from the stream, return tuple (AsyncResponse, keep_alive). """
+        status_line = (await reader.readline()).decode("iso-8859-1")
+        if not status_line:
+            raise http.client.BadStatusLine(status_line)
+        status = status_line.split(None, 2)
+        if len(status) < 2 or not status[0].startswith("HTTP/"):
+            raise http.client.BadStatusLine(status_line)
+        version = status[0]
+        code = int(status[1])
+        reason = status[2].strip() if len(status) > 2 else ""
+
+        header_lines = []
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            header_lines.append(line.decode("iso-8859-1"))
+        headers = email.parser.Parser(_class=http.client.HTTPMessage).parsestr("".join(header_lines))
+
+        keep_alive = version == "HTTP/1.1" and headers.get("Connection", "").lower() != "close"
+        if method == "HEAD" or code in (204, 304) or 100 <= code < 200:
+            body = b""
+        elif headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0].strip(), 16)
+                if size == 0:
+                    # Skip trailers
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            body = b"".join(chunks)
+        elif headers.get("Content-Length") is not None:
+            body = await reader.readexactly(int(headers["Content-Length"]))
+        else:
+            body = await reader.read()
+            keep_alive = False
+        encoding = headers.get("Content-Encoding")
+        if encoding is not None:
+            body = _decode_content(body, encoding)
+            del headers["Content-Encoding"]
+        return AsyncResponse(url, code, reason, headers, body), keep_alive
+
+
+
+############################################################
+### Parsers.                                             ###
+############################################################
+
+class AsyncCacheDetails(CacheDetails):
+    """
+    CacheDetails with coroutine get and asynchronous generator get_many.
+
+    """
+
+    http = AsyncHTTPInterface
+
+    async def get(self, id_, logs=None):
+        """
+        Get cache details by guid or waypoint.
+
+        Arguments:
+            id_         --- Geocache waypoint or guid.
+
+        Keyworded arguments:
+            logs        --- Download complete list of logs.
+
+        """
+        url = self._get_url(id_, logs)
+        data = await self.http.request(url, auth=True)
+        return self._parse(data, id_, url)
+
+    async def get_many(self, ids, logs=None, workers=1, max_failures=5):
+        """
+        Get cache details of many caches by guid or waypoint, asynchronously
+        yield them as they are parsed. Caches which cannot be downloaded are
+        skipped as by CacheDetails.get_many.
+
+        Arguments:
+            ids         --- Iterable of geocache waypoints or guids.
+
+        Keyworded arguments:
+            logs        --- Download complete list of logs.
+            workers     --- Number of caches downloaded concurrently.
+            max_failures --- Number of failed caches in a row to give up.
+
+        """
+        semaphore = asyncio.Semaphore(max(1, workers))
+
+        async def get(id_):
+            async with semaphore:
+                try:
+                    return id_, await self.get(id_, logs), None
+                except DownloadError as e:
+                    return id_, None, e
+
+        tasks = [asyncio.ensure_future(get(id_)) for id_ in ids]
+        failures = 0
+        try:
+            for task in asyncio.as_completed(tasks):
+                id_, details, error = await task
+                if error is not None:
+                    failures = self._skip_failed(id_, error, failures, max_failures)
+                    continue
+                failures = 0
+                yield details
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+class AsyncMyGeocachingLogs(MyGeocachingLogs):
+    """
+    MyGeocachingLogs with coroutine get and get_finds.
+
+    """
+
+    http = AsyncHTTPInterface
+
+    async def get(self, log_types=None, since=None):
+        """
+        Parse and return list of user's geocaching logs.
+
+        Keyworded arguments:
+            log_types       --- If not None return only logs of listed type.
+            since           --- Luid of the newest known log, see
+                                MyGeocachingLogs.get.
+
+        """
+        data = await self.http.request(self._url, auth=True)
+        return self._parse(data, log_types, since)
+
+
+class AsyncSeekCache(SeekCache):
+    """
+    SeekCache with coroutine get (coord, user and owner return coroutines too).
+
+    """
+
+    http = AsyncHTTPInterface
+
+    async def get(self, url):
+        """
+        Parse and return AsyncSeekResult of found caches on url.
+
+        Arguments:
+            url         --- URL where to start search.
+
+        """
+        count, caches, post_data = await self._get_page(url)
+        return AsyncSeekResult(caches, count, url, post_data, self)
+
+    async def _get_page(self, url, post_data=None):
+        data = await self.http.request(url, data=post_data, cache=False)
+        return self._process_page(data)
+
+
+class AsyncSeekCacheOCR(AsyncSeekCache, SeekCacheOCR):
+    """
+    SeekCacheOCR with coroutine get, images of codes unknown to OCRMemo are
+    downloaded concurrently on the event loop, within the same limits as by
+    SeekCacheOCR.images.
+
+    """
+
+    _semaphores = {}
+
+    async def _get_page(self, url, post_data=None):
+        data = await self.http.request(url, data=post_data, cache=False)
+        codes, unknown = self._lookup_codes(data)
+        if len(unknown) > 0:
+            urls = list(unknown)
+            images = await asyncio.gather(*[self._download_image(url) for url in urls])
+            self._store_images(unknown, dict(zip(urls, images)))
+        return self._process_page(data, codes)
+
+    async def _download_image(self, url):
+        """ Download image, return empty Image on failure. """
+        images = self.images
+        if HTTPInterface.replay:
+            # Images are not archived
+            return Image()
+        try:
+            async with self._semaphore(None, images.workers):
+                async with self._semaphore(urllib.parse.urlparse(url).netloc, images.per_host):
+                    await self.http.wait(False)
+                    response = await self.http.download_url(url, policy=images.retry_policy)
+            return Image.from_data(response.body)
+        except Exception as e:
+            self._log.warn("Cannot get image '{0}': {1}".format(url, e))
+            return Image()
+
+    @classmethod
+    def _semaphore(cls, host, limit):
+        """ Return semaphore limiting concurrent downloads from the host, or all downloads for None. """
+        key = (asyncio.get_event_loop(), host)
+        if key not in cls._semaphores:
+            cls._semaphores[key] = asyncio.Semaphore(limit)
+        return cls._semaphores[key]
+
+
+class AsyncSeekResult:
+    """
+    Asynchronous iterator over a result of seek query with lazy loading of next
+    pages.
+
+    Methods:
+        load_next_page  --- Download and parse the next page of results.
+
+    """
+
+    def __init__(self, caches, count, url, post_data, parser):
+        """
+        Arguments:
+            caches      --- Initial set of caches.
+            count       --- Total count of caches.
+            url         --- URL for future downloads.
+            post_data   --- POST data for future downloads.
+            parser      --- AsyncSeekCache object.
+
+        """
+        self._log = logging.getLogger("gcparser.AsyncSeekResult")
+        self._count = count
+        self._caches = list(caches)
+        if len(self._caches) not in (self._count, 20):
+            self._log.critical("Seems like I missed some caches in the list, got only {0} caches on first page out of total {1}.".format(len(self._caches), self._count))
+        self._url = url
+        self._post_data = post_data
+        self._parser = parser
+
+    async def load_next_page(self):
+        """
+        Download and parse the next page of results, raise IndexError if there
+        are no caches on it.
+
+        """
+        count, caches, post_data = await self._parser._get_page(self._url, self._post_data)
+        if not (len(caches) == 20 or len(caches) + len(self._caches) == self._count):
+            self._log.critical("Seems like I missed some caches in the list, got only {0} caches on this page, total {1} caches out of {2}.".format(len(caches), len(caches)+len(self._caches), self._count))
+        if len(caches) == 0:
+            raise IndexError("No caches on the page at index {0} out of {1}.".format(len(self._caches), self._count))
+        self._post_data = post_data
+        self._caches.extend(caches)
+
+    async def __aiter__(self):
+        index = 0
+        while index < self._count:
+            while index >= len(self._caches):
+                await self.load_next_page()
+            yield self._caches[index]
+            index += 1
+
+    def __len__(self):
+        return self._count
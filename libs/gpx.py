@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+    gpx.py - reading geocaches from GPX files and Pocket Query zip archives.
+    Copyright (C) 2009-2011 Petr Morávek
+
+    This file is part of Pyggs.
+
+    Pyggs is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation; either version 2 of the License, or
+    (at your option) any later version.
+
+    Pyggs is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along
+    with this program; if not, write to the Free Software Foundation, Inc.,
+    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+import logging
+import os.path
+import time
+import urllib.parse
+from xml.etree import ElementTree
+import zipfile
+
+__version__ = "0.1"
+__all__ = ["GPXReader"]
+
+
+class GPXReader(object):
+    """ Incremental reader of geocaches from GPX file or Pocket Query zip archive.
+        Iterating yields dictionaries with the same keys as gcparser.CacheDetails,
+        plus lastCheck set to the timestamp of the file. Only owner_id, attributes
+        and inventory are left out, since GPX names attributes and trackables
+        differently than the cache details page.
+    """
+
+    def __init__(self, filename):
+        self.log = logging.getLogger("Pyggs.GPX")
+        self.filename = filename
+
+
+    def __iter__(self):
+        if zipfile.is_zipfile(self.filename):
+            with zipfile.ZipFile(self.filename) as archive:
+                for info in archive.infolist():
+                    if not info.filename.lower().endswith(".gpx"):
+                        continue
+                    self.log.debug("Reading {0} from {1}.".format(info.filename, self.filename))
+                    lastCheck = int(time.mktime(info.date_time + (0, 0, -1)))
+                    with archive.open(info) as fp:
+                        for cache in self.readCaches(fp, lastCheck):
+                            yield cache
+        else:
+            lastCheck = int(os.path.getmtime(self.filename))
+            with open(self.filename, "rb") as fp:
+                for cache in self.readCaches(fp, lastCheck):
+                    yield cache
+
+
+    def readCaches(self, fp, lastCheck):
+        """ Parse GPX file object element by element, yield geocaches.
+        """
+        events = ElementTree.iterparse(fp, events=("start", "end"))
+        root = None
+        for event, element in events:
+            if root is None:
+                root = element
+            if event == "end" and localName(element.tag) == "wpt":
+                cache = self.parseWaypoint(element)
+                if cache is not None:
+                    cache["lastCheck"] = lastCheck
+                    yield cache
+                # Keep only the unprocessed part of the document in memory
+                root.clear()
+
+
+    def parseWaypoint(self, wpt):
+        """ Return geocache details from wpt element, or None for additional waypoints.
+        """
+        children = dict((localName(child.tag), child) for child in wpt)
+        cacheElement = children.get("cache")
+        if cacheElement is None:
+            return None
+        details = dict((localName(child.tag), child) for child in cacheElement)
+
+        cache = {}
+        guid = None
+        url = children.get("url")
+        if url is not None:
+            guid = guidFromUrl(url.text)
+        elif children.get("link") is not None:
+            guid = guidFromUrl(children["link"].get("href"))
+        if guid is None:
+            self.log.warn(_("Cannot find guid of geocache {0} in GPX, skipping.").format(text(children.get("name"))))
+            return None
+        cache["guid"] = guid
+        cache["waypoint"] = text(children.get("name"))
+        cache["lat"] = float(wpt.get("lat"))
+        cache["lon"] = float(wpt.get("lon"))
+        cache["hidden"] = text(children.get("time"))[:10]
+
+        cache["name"] = text(details.get("name"))
+        cache["owner"] = text(details.get("placed_by")) or text(details.get("owner"))
+        cache["type"] = text(details.get("type"))
+        # GS weird changes bug
+        if cache["type"] == "Unknown Cache":
+            cache["type"] = "Mystery/Puzzle Cache"
+        cache["size"] = text(details.get("container"))
+        cache["difficulty"] = float(text(details.get("difficulty")) or 0)
+        cache["terrain"] = float(text(details.get("terrain")) or 0)
+        cache["country"] = text(details.get("country"))
+        cache["province"] = text(details.get("state"))
+        cache["hint"] = text(details.get("encoded_hints"))
+
+        cache["archived"] = int(cacheElement.get("archived", "False").lower() == "true")
+        cache["disabled"] = int(cache["archived"] == 1 or cacheElement.get("available", "True").lower() != "true")
+        return cache
+
+
+
+def localName(tag):
+    """ Return tag name without namespace, GPX and Groundspeak namespaces differ by version.
+    """
+    return tag.rsplit("}", 1)[-1]
+
+
+def text(element):
+    """ Return stripped text of the element, or empty string.
+    """
+    if element is None or element.text is None:
+        return ""
+    return element.text.strip()
+
+
+def guidFromUrl(url):
+    """ Return guid from cache details URL, or None.
+    """
+    if url is None:
+        return None
+    query = urllib.parse.parse_qs(urllib.parse.urlparse(url.strip()).query)
+    guid = query.get("guid")
+    if guid is None:
+        return None
+    return guid[0]
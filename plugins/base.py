@@ -71,6 +71,13 @@ class Plugin(object):
                 self.config[option] = self.master.config.get(self.NS, option)
 
 
+    def plannedCaches(self):
+        """Guids of caches requested from cache plugin, all found caches for plugins using myfinds and cache"""
+        if "myfinds" in self.dependencies and "cache" in self.dependencies:
+            return self.myfinds.storage.getList()
+        return []
+
+
 class Storage(object):
     def __init__(self, filename, plugin=None):
         if plugin is None:
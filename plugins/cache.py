@@ -34,6 +34,7 @@ from versioning import VersionInfo
 class Plugin(base.Plugin):
     _elevation_retry = 3
     _elevation_wait = 5
+    _large_download = 600
 
     def __init__(self, master):
         base.Plugin.__init__(self, master)
@@ -48,6 +49,10 @@ class Plugin(base.Plugin):
         config.defaults[self.NS] = {}
         config.defaults[self.NS]["timeout"] = "14"
         config.update(self.NS, "timeout", _("Cache details data timeout in days:"), validate=lambda val: None if val.isdigit() else _("Use only digits, please."))
+        config.defaults[self.NS]["workers"] = "3"
+        config.update(self.NS, "workers", _("Number of cache details downloaded concurrently:"), validate=lambda val: None if val.isdigit() and int(val) > 0 else _("Use only digits, please."))
+        config.defaults[self.NS]["maxdownloads"] = "0"
+        config.update(self.NS, "maxdownloads", _("Maximum number of cache details downloaded in one run, the rest is deferred to later runs (0 = unlimited):"), validate=lambda val: None if val.isdigit() else _("Use only digits, please."))
 
 
     def onPyggsUpgrade(self, oldVersion):
@@ -114,23 +119,54 @@ class Plugin(base.Plugin):
         self.storage = Storage(self.master.globalStorage.filename, self)
         base.Plugin.prepare(self)
         self.config["timeout"] = int(self.config["timeout"])
+        self.config["workers"] = int(self.config.get("workers", 1))
+        self.config["maxdownloads"] = int(self.config.get("maxdownloads", 0))
+        self.downloads = 0
 
         self.homecoord = {}
         self.homecoord["lat"] = float(self.master.config.get("general", "homelat"))
         self.homecoord["lon"] = float(self.master.config.get("general", "homelon"))
 
-        self.master.registerHandler("cache", self.parseCache)
+        self.master.registerBatchHandler("cache", self.parseCaches)
 
 
-    def parseCache(self, cache):
-        """Update Cache database"""
-        details = dict(cache)
-        if "lat" in details and "lon" in details:
-            elevation = self.getElevation(details["lat"], details["lon"])
-            if elevation is not None:
-                details["elevation"] = elevation
-        self.log.info(_("Updating Cache database for {0}: {1}.").format(details.get("waypoint"), details.get("name")))
-        self.storage.update(details)
+    def planDownloads(self, guids):
+        """Estimate the download of outdated caches before any fetching, warn before large downloads"""
+        count = len(self.storage.getOutdated(guids))
+        if count == 0:
+            self.log.info(_("Cache database is up to date, no downloads needed."))
+            return
+        limit = self.config["maxdownloads"]
+        if limit > 0 and count > limit:
+            self.log.warn(_("{0} caches need refresh, downloading only {1} of them in this run, the rest is deferred to later runs.").format(count, limit))
+            count = limit
+        eta = self.master.expectedWait(count)
+        message = _("Going to download details of {0} caches, expected time {1:d}h {2:02d}m.").format(count, int(eta // 3600), int(eta % 3600 // 60))
+        if eta >= self._large_download:
+            self.log.warn(message)
+        else:
+            self.log.info(message)
+
+
+    def allowDownloads(self, guids):
+        """Cut the list of caches to download to the remaining budget of this run"""
+        limit = self.config["maxdownloads"]
+        if limit > 0 and self.downloads + len(guids) > limit:
+            self.log.debug("Download budget exhausted, deferring {0} caches.".format(self.downloads + len(guids) - limit))
+            guids = guids[:max(0, limit - self.downloads)]
+        self.downloads += len(guids)
+        return guids
+
+
+    def parseCaches(self, caches):
+        """Update Cache database by a batch of caches in one transaction"""
+        for details in caches:
+            if "lat" in details and "lon" in details:
+                elevation = self.getElevation(details["lat"], details["lon"])
+                if elevation is not None:
+                    details["elevation"] = elevation
+            self.log.info(_("Updating Cache database for {0}: {1}.").format(details.get("waypoint"), details.get("name")))
+        self.storage.updateMany(caches)
 
 
     def distance(self, lat1, lon1, lat2=None, lon2=None):
@@ -192,28 +228,49 @@ class Storage(base.Storage):
 
     def update(self, data):
         """Update Cache database by data"""
-        if "guid" not in data:
-            self.log.error(_("No guid passed, not updating."))
-            return
+        self.updateMany([data])
 
+
+    def updateMany(self, rows, force=False):
+        """Update Cache database by list of data in one transaction, return number of updated caches, force updates even older data"""
         db = self.getDb()
         cur = db.cursor()
+        updated = 0
+        for data in rows:
+            if self.updateCache(cur, data, force):
+                updated += 1
+        db.commit()
+        db.close()
+        return updated
+
+
+    def updateCache(self, cur, data, force=False):
+        """Update one cache, data with lastCheck older than the stored one are skipped unless forced"""
+        if "guid" not in data:
+            self.log.error(_("No guid passed, not updating."))
+            return False
+        lastCheck = int(data.get("lastCheck", time.time()))
+
+        old = cur.execute("SELECT * FROM cache WHERE guid=?", (data["guid"],)).fetchone()
+        if not force and old is not None and int(old["lastCheck"]) > lastCheck:
+            self.log.debug("Stored details of {0} are newer, not updating.".format(data["guid"]))
+            return False
 
-        cur.execute("DELETE FROM cache_inventory WHERE guid = ?", (data["guid"],))
-        for tbid in data.get("inventory", {}):
-            cur.execute("INSERT INTO cache_inventory(guid, tbid, name) VALUES(?,?,?)", (data["guid"], tbid, data["inventory"][tbid]))
+        if "inventory" in data:
+            cur.execute("DELETE FROM cache_inventory WHERE guid = ?", (data["guid"],))
+            for tbid in data["inventory"]:
+                cur.execute("INSERT INTO cache_inventory(guid, tbid, name) VALUES(?,?,?)", (data["guid"], tbid, data["inventory"][tbid]))
 
         if len(data.get("visits", [])) > 0:
             cur.execute("DELETE FROM cache_visits WHERE guid = ?", (data["guid"],))
             for logtype in data["visits"]:
                 cur.execute("INSERT INTO cache_visits(guid, type, count) VALUES(?,?,?)", (data["guid"], logtype, data["visits"][logtype]))
 
-        old = cur.execute("SELECT * FROM cache WHERE guid=?", (data["guid"],)).fetchone()
         if old is None:
             sql = "INSERT INTO cache(guid, waypoint, name, owner, owner_id, hidden, type, country, province, lat, lon, difficulty, terrain, size, disabled, archived, hint, attributes, lastCheck, elevation) VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)"
-            sql_data = (data["guid"], data.get("waypoint", "GC"), data.get("name", ""), data.get("owner", ""), data.get("owner_id", ""), data.get("hidden", ""), data.get("type", ""), data.get("country", ""), data.get("province", ""), data.get("lat", ""), data.get("lon", ""), data.get("difficulty", ""), data.get("terrain", ""), data.get("size", ""), data.get("disabled", ""), data.get("archived", ""), data.get("hint", ""), data.get("attributes", ""), int(time.time()), data.get("elevation", -9999))
+            sql_data = (data["guid"], data.get("waypoint", "GC"), data.get("name", ""), data.get("owner", ""), data.get("owner_id", ""), data.get("hidden", ""), data.get("type", ""), data.get("country", ""), data.get("province", ""), data.get("lat", ""), data.get("lon", ""), data.get("difficulty", ""), data.get("terrain", ""), data.get("size", ""), data.get("disabled", ""), data.get("archived", ""), data.get("hint", ""), data.get("attributes", ""), lastCheck, data.get("elevation", -9999))
         else:
-            update = {"lastCheck": int(time.time())}
+            update = {"lastCheck": lastCheck}
             for k in ("waypoint", "name", "owner", "owner_id", "hidden", "type", "country", "province", "lat", "lon", "difficulty", "terrain", "size", "disabled", "archived", "hint", "attributes", "elevation"):
                 if k in data:
                     update[k] = data[k]
@@ -223,22 +280,43 @@ class Storage(base.Storage):
             sql_data = tuple(list(update.values()) + [data["guid"]])
         self.log.debug(sql)
         cur.execute(sql, sql_data)
-        db.commit()
+        return True
+
+
+    def getOutdated(self, guids):
+        """Guids of caches with missing or out of date data, missing and oldest first"""
+        timeout = self.plugin.config["timeout"]*24*3600
+        outdated = {}
+        db = self.getDb()
+        cur = db.cursor()
+        for guid in guids:
+            if guid in outdated:
+                continue
+            row = cur.execute("SELECT lastCheck FROM cache WHERE guid = ?", (guid,)).fetchone()
+            if row is None:
+                outdated[guid] = -1
+            elif (timeout + int(row["lastCheck"])) <= int(time.time()):
+                outdated[guid] = int(row["lastCheck"])
         db.close()
+        return sorted(outdated, key=lambda guid: outdated[guid])
 
 
     def getDetails(self, guids):
-        """Selects data from database, performs update if neccessary"""
-        timeout = self.plugin.config["timeout"]*24*3600
+        """Selects data from database, performs update if neccessary, caches deferred by download budget and never downloaded are omitted"""
+        guids = list(guids)
         result = []
+        outdated = self.plugin.allowDownloads(self.getOutdated(guids))
+        for guid in outdated:
+            self.log.debug("Data about cache guid {0} out of date, initiating refresh.".format(guid))
+        if len(outdated) > 0:
+            self.plugin.master.parseMany("cache", [(guid,) for guid in outdated], workers=self.plugin.config["workers"])
         db = self.getDb()
         cur = db.cursor()
         for guid in guids:
             row = cur.execute("SELECT * FROM cache WHERE guid = ?", (guid,)).fetchone()
-            if row is None or (timeout + int(row["lastCheck"])) <= int(time.time()):
-                self.log.debug("Data about cache guid {0} out of date, initiating refresh.".format(guid))
-                self.plugin.master.parse("cache", guid)
-                row = cur.execute("SELECT * FROM cache WHERE guid = ?", (guid,)).fetchone()
+            if row is None:
+                self.log.info(_("Details of cache guid {0} are not downloaded yet, skipping.").format(guid))
+                continue
             row = dict(row)
             row["inventory"] = {}
             for inv in cur.execute("SELECT tbid, name FROM cache_inventory WHERE guid = ?", (guid,)).fetchall():
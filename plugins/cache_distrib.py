@@ -43,7 +43,8 @@ class Plugin(base.Plugin):
         caches = self.cache.storage.getDetails(myFinds)
 
         templateData = {}
-        templateData["total"] = len(myFinds)
+        # Caches deferred by the download budget are left out of all counts
+        templateData["total"] = len(caches)
         templateData["countries"] = self.getCountries(caches)
         templateData["types"] = self.getTypes(caches)
         templateData["sizes"] = self.getSizes(caches)
@@ -54,7 +54,11 @@ class Plugin(base.Plugin):
         for row in self.myfinds.storage.select():
             if len(finds) > 0:
                 finds = finds + "|"
-            details = self.cache.storage.getDetails([row["guid"]])[0]
+            details = self.cache.storage.getDetails([row["guid"]])
+            if len(details) == 0:
+                self.log.warn(_("Details of some found caches are not downloaded yet, skipping Geocaching.cz database update."))
+                return
+            details = details[0]
             finds = finds + "{0};{1};{2};{3}".format(details["waypoint"], row["date"], details["lat"], details["lon"])
 
         hash = str(finds)
@@ -47,7 +47,27 @@ class Plugin(base.Plugin):
         self.stats.registerTemplate(":stats.milestones", templateData)
 
 
+    def plannedCaches(self):
+        """Guids of caches requested from cache plugin"""
+        return [cache["guid"] for cache in self.getMilestoneFinds()]
+
+
     def getMilestones(self):
+        result = []
+        myFinds = self.getMilestoneFinds()
+        guids = [cache["guid"] for cache in myFinds]
+        caches = self.cache.storage.fetchAssoc(self.cache.storage.getDetails(guids), "guid")
+        for cache in myFinds:
+            if cache["guid"] not in caches:
+                continue
+            cache.update(caches[cache["guid"]])
+            if cache["name"] == "":
+                cache["name"] = "[PM-only cache]"
+            result.append(cache)
+        return result
+
+
+    def getMilestoneFinds(self):
         result = []
         myFinds = self.myfinds.storage.select("SELECT * FROM myfinds ORDER BY date ASC, sequence ASC")
         milestones = self.config["milestones"].split(",")
@@ -56,17 +76,10 @@ class Plugin(base.Plugin):
                 milestones[i] = "^{0:d}$".format(len(myFinds))
             else:
                 milestones[i] = "^{0}$".format(milestones[i].strip())
-        guids = []
         for cache in myFinds:
             for milestone in milestones:
                 match = re.match(milestone, str(cache["sequence"]))
                 if match is not None:
                     self.log.debug("Cache {0} matches expr {1}.".format(cache["sequence"], milestone))
-                    guids.append(cache["guid"])
                     result.append(dict(cache))
-        caches = self.cache.storage.fetchAssoc(self.cache.storage.getDetails(guids), "guid")
-        for cache in result:
-            cache.update(caches[cache["guid"]])
-            if cache["name"] == "":
-                cache["name"] = "[PM-only cache]"
         return result
@@ -39,12 +39,15 @@ class Plugin(base.Plugin):
         config.defaults[self.NS] = {}
         config.defaults[self.NS]["timeout"] = "24"
         config.update(self.NS, "timeout", _("My Finds data timeout in hours:"), validate=lambda val: None if val.isdigit() else _("Use only digits, please."))
+        config.defaults[self.NS]["fullsync"] = "7"
+        config.update(self.NS, "fullsync", _("Interval of complete My Finds refresh in days, otherwise only new finds are fetched (0 = always complete):"), validate=lambda val: None if val.isdigit() else _("Use only digits, please."))
 
 
     def onPyggsUpgrade(self, oldVersion):
         # Force update of myFinds database
         self.log.warn(_("New version of Pyggs: forcing database update."))
         self.storage.delEnv("lastcheck")
+        self.storage.delEnv("lastfullsync")
         return True
 
 
@@ -52,6 +55,7 @@ class Plugin(base.Plugin):
         self.storage = Storage(self.master.profileStorage.filename, self)
         base.Plugin.prepare(self)
         self.config["timeout"] = int(self.config["timeout"])
+        self.config["fullsync"] = int(self.config.get("fullsync", 7))
         self.master.registerHandler("myFinds", self.parseMyFinds)
 
 
@@ -59,12 +63,17 @@ class Plugin(base.Plugin):
         """Update MyFinds database"""
         self.log.info(_("Updating MyFinds database."))
         myFinds = list(myFinds)
+        since = self.storage.since
         if len(myFinds) == 0:
             if self.storage.query("SELECT COUNT(*) FROM myfinds")[0][0] == 0:
                 self.log.critical(_("Got zero myFinds records (bug?) and local databse is empty too."))
             else:
                 self.log.error(_("Got zero myFinds records (bug?), leaving old database in place."))
+        elif since is not None and myFinds[0].luid == since:
+            self.storage.append(myFinds[1:])
         else:
+            if since is not None:
+                self.log.warn(_("The newest known find was not found in My Finds, refreshing the whole database."))
             self.storage.update(myFinds)
 
 
@@ -73,6 +82,7 @@ class Storage(base.Storage):
     def __init__(self, filename, plugin):
         base.Storage.__init__(self, filename, plugin)
         self.valid = None
+        self.since = None
 
 
     def createTables(self):
@@ -97,11 +107,25 @@ class Storage(base.Storage):
             self.valid = True
         else:
             self.log.info(_("MyFinds database out of date, initiating refresh."))
-            self.plugin.master.parse("myFinds")
+            self.since = self.getSince()
+            self.plugin.master.parse("myFinds", since=self.since)
 
         return self.valid
 
 
+    def getSince(self):
+        """Luid of the newest find to sync from, or None if complete refresh is due"""
+        lastFullSync = self.getEnv("lastfullsync")
+        interval = self.plugin.config["fullsync"]*24*3600
+        if interval == 0 or lastFullSync is None or float(lastFullSync)+interval < int(time.time()):
+            self.log.debug("Complete refresh of MyFinds database is due.")
+            return None
+        newest = self.query("SELECT luid FROM myfinds ORDER BY sequence DESC LIMIT 1")
+        if len(newest) == 0:
+            return None
+        return newest[0]["luid"]
+
+
     def update(self, data):
         """Update MyFinds database by data"""
         self.query("DROP TABLE myfinds")
@@ -113,6 +137,21 @@ class Storage(base.Storage):
         db.commit()
         db.close()
         self.setEnv("lastcheck", int(time.time()))
+        self.setEnv("lastfullsync", int(time.time()))
+        self.valid = True
+
+
+    def append(self, data):
+        """Add new finds to MyFinds database"""
+        self.log.debug("Adding {0} new finds.".format(len(data)))
+        db = self.getDb()
+        cur = db.cursor()
+        sequence = cur.execute("SELECT COALESCE(MAX(sequence), 0) FROM myfinds").fetchone()[0]
+        for i in range(len(data)):
+            cur.execute("INSERT OR REPLACE INTO myfinds(guid, sequence, date, luid) VALUES(?,?,?,?)", (data[i].cache["guid"], sequence+i+1, data[i].date, data[i].luid))
+        db.commit()
+        db.close()
+        self.setEnv("lastcheck", int(time.time()))
         self.valid = True
 
 
@@ -39,6 +39,7 @@ import urllib.request
 sys.path.insert(0, os.path.join(sys.path[0], "libs"))
 
 from configuration import ProfileConfig
+from gpx import GPXReader
 from output import Templar, Theme
 import console as console
 import gcparser as gcparser
@@ -57,6 +58,8 @@ gettext.install("pyggs", localedir=localeDir, codeset="utf-8")
 
 
 class Pyggs(object):
+    _reparseBatch = 500
+
     def __init__(self, workDir, profile):
         self.log = logging.getLogger("Pyggs")
         self.version = VersionInfo(__version__)
@@ -64,6 +67,9 @@ class Pyggs(object):
         self.profile = profile
         self.config = ProfileConfig(os.path.join(workDir, "pyggs", "profiles", profile, "config.ini"))
         self.plugins = {}
+        self.archive = None
+        self.replay = False
+        self._fetchOpener = urllib.request.build_opener(gcparser.ContentEncodingProcessor())
         self.templateDirs = [os.path.join(self.workDir, "pyggs", "templates"), os.path.join(os.path.abspath(os.path.dirname(__file__)), "templates")]
         self.themeDirs = [os.path.join(self.workDir, "pyggs", "themes"), os.path.join(os.path.abspath(os.path.dirname(__file__)), "themes")]
         # Set prefered language
@@ -324,17 +330,23 @@ class Pyggs(object):
         config = self.config
         # Init GCparser, and redefine again self.log
         gcparser.HTTPInterface.set_data_dir(os.path.join(self.workDir, "parser"))
+        if self.archive is not None:
+            gcparser.HTTPInterface.set_archive(self.archive, replay=self.replay)
         gcparser.HTTPInterface.set_credentials(gcparser.Credentials(config.get("geocaching.com", "username"), password=config.get("geocaching.com", "password")))
 
+        cacheDetails = gcparser.CacheDetails()
         self.parsers = {}
-        self.parsers["cache"] = gcparser.CacheDetails().get
+        self.parsers["cache"] = cacheDetails.get
         self.parsers["myFinds"] = gcparser.MyGeocachingLogs().get_finds
         self.parsers["editProfile"] = gcparser.Profile().update
+        self.manyParsers = {}
+        self.manyParsers["cache"] = cacheDetails.get_many
 
         self.globalStorage = Storage(os.path.join(self.workDir, "pyggs", "storage.sqlite"))
         self.profileStorage = Storage(os.path.join(self.workDir, "pyggs", "profiles", profile, "storage.sqlite"))
 
         self.handlers = {}
+        self.batchHandlers = {}
         self.pages = {}
         self.loadPlugins()
         self.makeDepTree()
@@ -345,6 +357,14 @@ class Pyggs(object):
                 self.log.info(_("Preparing plugin {0}...").format(plugin))
                 self.plugins[plugin].prepare()
 
+        # Plan downloads
+        planned = set()
+        for plugin in self.plugins:
+            if hasattr(self.plugins[plugin], "plannedCaches"):
+                planned.update(self.plugins[plugin].plannedCaches())
+        if "cache" in self.plugins:
+            self.plugins["cache"].planDownloads(planned)
+
         # Run plugins
         for plugin in self.plugins:
             if hasattr(self.plugins[plugin], "run"):
@@ -381,14 +401,62 @@ class Pyggs(object):
             self.handlers[parsername].append(handler)
 
 
+    def registerBatchHandler(self, parsername, handler):
+        """ Register handler that gets list of Parser objects, when parse() or parseMany()
+            method is called.
+        """
+        try:
+            self.batchHandlers[parsername].append(handler)
+        except KeyError:
+            self.batchHandlers[parsername] = []
+            self.batchHandlers[parsername].append(handler)
+
+
     def parse(self, name, *args, **kwargs):
         """ Create parser and return it to every registered handler.
         """
-        handlers = self.handlers.get(name)
-        if handlers is not None:
+        handlers = self.handlers.get(name, [])
+        batchHandlers = self.batchHandlers.get(name, [])
+        if len(handlers) > 0 or len(batchHandlers) > 0:
             result = self.parsers[name](*args, **kwargs)
             for handler in handlers:
                 handler(result)
+            for handler in batchHandlers:
+                handler([result])
+
+
+    def parseMany(self, name, argsList, workers=1, batch=100):
+        """ Run parser for every item of argsList (tuples of arguments), return the results
+            to every registered handler as they come, and to batch handlers in lists of
+            up to batch results. Parsers with many-items variant (e.g. CacheDetails.get_many)
+            run workers concurrently. Handlers are always called from the calling thread.
+        """
+        handlers = self.handlers.get(name, [])
+        batchHandlers = self.batchHandlers.get(name, [])
+        if len(handlers) == 0 and len(batchHandlers) == 0:
+            return
+        argsList = list(argsList)
+        if name in self.manyParsers:
+            results = self.manyParsers[name]([args[0] for args in argsList], workers=workers)
+        else:
+            results = (self.parsers[name](*args) for args in argsList)
+
+        pending = []
+        try:
+            for result in results:
+                for handler in handlers:
+                    handler(result)
+                if len(batchHandlers) > 0:
+                    pending.append(result)
+                if len(pending) >= batch:
+                    for handler in batchHandlers:
+                        handler(pending)
+                    pending = []
+        finally:
+            # Results parsed before an error are not lost
+            if len(pending) > 0:
+                for handler in batchHandlers:
+                    handler(pending)
 
 
     def loadPlugin(self, name):
@@ -516,7 +584,7 @@ class Pyggs(object):
         try:
             if data is not None:
                 data = urllib.parse.urlencode(data).encode("utf-8")
-            response = urllib.request.urlopen(url, data=data, timeout=timeout)
+            response = self._fetchOpener.open(url, data=data, timeout=timeout)
         except IOError:
             self.log.error(_("Could not fetch URL {0}.").format(url))
             return None
@@ -526,6 +594,102 @@ class Pyggs(object):
         return response
 
 
+    def expectedWait(self, count=1):
+        """ Return the expected number of seconds needed for downloading count pages
+            from geocaching.com.
+        """
+        return gcparser.HTTPInterface.expected_wait(count)
+
+
+    def reparse(self, directory, workers=None):
+        """ Parse cache details pages from archive directory in a pool of worker
+            processes and update Cache database by the results in batches. Stored
+            details are replaced even if checked later than the page was archived,
+            since they may be parsed from the very same page.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+
+        self.globalStorage = Storage(os.path.join(self.workDir, "pyggs", "storage.sqlite"))
+        # Only the storage of the plugin is used, so it is not prepared (that
+        # needs the profile and registers the plugin for downloads)
+        self.loadPlugin("cache")
+        storage = plugins.cache.Storage(self.globalStorage.filename, self.plugins["cache"])
+
+        filenames = gcparser.PageArchive(directory).files()
+        self.log.info(_("Re-parsing {0} archived pages.").format(len(filenames)))
+        parsed = 0
+        updated = 0
+        batch = []
+        with ProcessPoolExecutor(workers) as executor:
+            for details, error in executor.map(reparseCacheDetails, filenames, chunksize=32):
+                if error is not None:
+                    self.log.error(error)
+                if details is None:
+                    continue
+                parsed += 1
+                batch.append(details)
+                if len(batch) >= self._reparseBatch:
+                    updated += storage.updateMany(batch, force=True)
+                    batch = []
+                    self.log.info(_("Re-parsed {0} cache details pages.").format(parsed))
+        if len(batch) > 0:
+            updated += storage.updateMany(batch, force=True)
+        self.log.warn(_("Re-parsed {0} cache details pages, {1} caches updated.").format(parsed, updated))
+
+
+    def importGPX(self, filenames):
+        """ Update Cache database by geocaches from GPX files or Pocket Query zip
+            archives, no network access.
+        """
+        self.globalStorage = Storage(os.path.join(self.workDir, "pyggs", "storage.sqlite"))
+        # Only the storage of the plugin is used, see reparse
+        self.loadPlugin("cache")
+        storage = plugins.cache.Storage(self.globalStorage.filename, self.plugins["cache"])
+
+        imported = 0
+        updated = 0
+        for filename in filenames:
+            self.log.info(_("Importing geocaches from '{0}'.").format(filename))
+            batch = []
+            try:
+                for details in GPXReader(filename):
+                    imported += 1
+                    batch.append(details)
+                    if len(batch) >= self._reparseBatch:
+                        updated += storage.updateMany(batch)
+                        batch = []
+            except Exception as e:
+                self.log.error(_("Cannot read GPX file '{0}': {1}").format(filename, e))
+            if len(batch) > 0:
+                updated += storage.updateMany(batch)
+        self.log.warn(_("Imported {0} geocaches, {1} caches updated.").format(imported, updated))
+
+
+    def fetchAsync(self, url, data=None, timeout=20):
+        """ Return coroutine downloading url on asyncio event loop (Python 3.6+).
+        """
+        from gcparser_async import AsyncHTTPInterface
+        return AsyncHTTPInterface.fetch(url, data=data, timeout=timeout)
+
+
+
+def reparseCacheDetails(filename):
+    """ Parse archived page in a worker process of Pyggs.reparse, return tuple
+        (details, error), details are None for other than cache details pages.
+    """
+    page = gcparser.PageArchive(os.path.dirname(filename)).read(filename)
+    if page is None or "cache_details.aspx" not in page.url:
+        return None, None
+    try:
+        details = gcparser.CacheDetails().parse_page(page.body, page.url)
+    except Exception as e:
+        return None, _("Cannot parse archived page '{0}': {1}").format(page.url, e)
+    # Deferred fields are not needed by Cache database, and cannot be pickled
+    details = dict((key, details[key]) for key in details if details.is_loaded(key))
+    details["lastCheck"] = int(page.time)
+    return details, None
+
+
 
 if __name__ == "__main__":
     # Setup console output logging
@@ -544,6 +708,11 @@ if __name__ == "__main__":
     optp.add_option("-v", "--verbose", help=_("set logging to INFO"), dest="loglevel", action="store_const", const=logging.INFO)
     optp.add_option("-d", "--debug", help=_("set logging to DEBUG"), dest="loglevel", action="store_const", const=logging.DEBUG)
     optp.add_option("-D", "--Debug", help=_("set logging to ALL"), dest="loglevel", action="store_const", const=0)
+    optp.add_option("--record", help=_("record all downloaded pages to archive directory"), dest="record", metavar="DIR", default=None)
+    optp.add_option("--replay", help=_("replay pages from archive directory, no network access to geocaching.com"), dest="replay", metavar="DIR", default=None)
+    optp.add_option("--reparse", help=_("update Cache database from cache details pages in archive directory, no network access"), dest="reparse", metavar="DIR", default=None)
+    optp.add_option("--import", help=_("update Cache database from GPX file or Pocket Query zip archive, can be used multiple times, no network access"), dest="gpx", metavar="FILE", action="append", default=[])
+    optp.add_option("--trace", help=_("print time spent in parsing regular expressions and their success"), dest="trace", action="store_true", default=False)
 
     opts,args = optp.parse_args()
     rootlog.setLevel(opts.loglevel)
@@ -638,9 +807,28 @@ if __name__ == "__main__":
                 fp.write(__version__)
 
     pyggs = Pyggs(workDir, profile)
+    if opts.replay is not None:
+        pyggs.archive = opts.replay
+        pyggs.replay = True
+    elif opts.record is not None:
+        pyggs.archive = opts.record
     if setup == "full":
         pyggs.fullSetup()
     elif setup == "interactive":
         pyggs.interactiveSetup()
     else:
-        pyggs.run()
+        if opts.trace:
+            gcparser.ParserTracer.enable()
+        try:
+            if opts.reparse is not None:
+                pyggs.reparse(opts.reparse)
+            elif len(opts.gpx) > 0:
+                pyggs.importGPX(opts.gpx)
+            else:
+                pyggs.run()
+        except gcparser.DownloadError as e:
+            rootlog.critical(_("Cannot download data from geocaching.com, giving up: {0}").format(e))
+            raise SystemExit(1)
+        finally:
+            if opts.trace:
+                print(gcparser.ParserTracer.summary())